@@ -1,9 +1,7 @@
-import asyncio
 import datetime
-import random
 import calendar
-from collections import defaultdict, Counter
-from dateutil import parser
+import random
+from collections import defaultdict
 
 import pytz
 import discord
@@ -13,10 +11,17 @@ from discord.ext.commands import Context
 import database.controllers.guilds as guildsdb
 import database.controllers.entries as entriesdb
 import database.controllers.entry_hist as entryhistdb
-import database.controllers.users as usersdb
-import database.controllers.enrollments as enrollmentsdb
+import database.controllers.stats as statsdb
 from helpers import checks
 from helpers.logger import logger
+from helpers.scheduler import Scheduler
+from helpers.executor import KeyedExecutor
+from helpers.draw_output import compose_draw
+from helpers.members import member_cache
+from helpers.embed_cache import embed_cache
+from helpers.output import MessageBuffer
+from helpers.dispatcher import dispatcher, PRIORITY_DRAW, PRIORITY_LOW
+from helpers.windows import parse_window, WINDOW_HELP
 from helpers.config import config as app_config
 
 NUM_DRAWS_DEFAULT = 2
@@ -26,7 +31,8 @@ class Draw(commands.Cog, name="draw"):
     def __init__(self, bot):
         self.bot = bot
         self.timezone = pytz.timezone(app_config["timezone"])
-        self.autodraw_tasks = {}
+        self.draw_executor = KeyedExecutor(app_config["draw_max_concurrency"])
+        self.autodraw_scheduler = Scheduler(self.autodraw, app_config["draw_max_concurrency"])
 
     """
     Helper Methods
@@ -40,130 +46,107 @@ class Draw(commands.Cog, name="draw"):
             channel_id: channel to output to
         """
         # Get guild and channel objects
-        guild = discord.utils.get(self.bot.guilds, id=guild_id)
+        guild = self.bot.get_guild(guild_id)
         if not guild:
             logger.error("Unable to find guild for guild id '{}'".format(guild_id))
             return
-        channel = discord.utils.get(guild.text_channels, id=channel_id)
-        if not channel:
+        channel = guild.get_channel(channel_id)
+        if not isinstance(channel, discord.TextChannel):
             logger.error("Unable to find channel for channel id '{}'".format(channel_id))
             return
 
-        def get_unanimous(entries: list[entriesdb.RespEntry]) -> str | None:
-            user_ids = set(e.user_id for e in entries)
-            names = set(e.name for e in entries)
-            for name in names:
-                name_user_ids = set(e.user_id for e in entries if e.name == name)
-                if user_ids == name_user_ids:
-                    return name
-            return None
-
-        # Notify channel about the incoming draw
-        await channel.send('**Running the draw and selecting {} winners**'.format(count))
+        # Compose the whole draw and send it at the end in as few messages as possible
+        output = MessageBuffer()
+        output.add_line('**Running the draw and selecting {} winners**'.format(count))
 
-        # Read all entries for the guild
-        entries = await entriesdb.read_all_entries_for_guild(guild.id)
+        # Read all entries for the guild, including any still queued
+        await entriesdb.flush_entries()
+        entries = await entriesdb.read_all_entries_for_guild_cached(guild.id)
         if not entries:
-            await channel.send('No entries found. Please enter some first with "!draw_enter".')
+            output.add_line('No entries found. Please enter some first with "!draw_enter".')
+            await output.send(channel, PRIORITY_DRAW)
             return
 
         # Run draw
-        selection_list = entries.copy()
-        winners_list = []
-        had_unanimous = False
-        for _ in range(count):
-            if not selection_list:
-                await channel.send('No more entries to draw from.')
-                return
-            # RULE_1: If a all users picked an entry, it wins automatically
-            # -------------------------------------------------------------
-            unanimous = get_unanimous(selection_list)
-            if unanimous is not None:
-                # Entry is unanimous so everyone wins. No need to enter into winners list
-                # Remove the unanimous entry from selection list
-                had_unanimous = True
-                selection_list[:] = [e for e in selection_list if e.name != unanimous]
-                await channel.send('**"{}"** automatically wins since selected by all users.'.format(unanimous))
-                continue
-            # RULE_2: All first picks get two entries in the draw unless we have already drawn a unanimous pick
-            # -------------------------------------------------------------------------------------------------
-            draw_list = []
-            for e in selection_list:
-                if not had_unanimous and e.first:
-                    draw_list.extend([e, e])
-                else:
-                    draw_list.append(e)
-            # Print list of entries being selected from
-            list_str=""
-            for i, item in enumerate(draw_list, start=1):
-                user = discord.utils.get(guild.members, id=int(item.user_id))
-                if user:
-                    list_str += f"{i}. {item.name} ({user.name})\n"
-            embed = discord.Embed(title="Selecting winner from list", description=list_str, color=0x00ff00)
-            await channel.send(embed=embed)
-            # Select winner
-            winner = random.choice(draw_list)
-            user = discord.utils.get(guild.members, id=int(winner.user_id))
-            if winner and user:
-                winners_list[:] += [winner]
-                # RULE_3: If a user wins, their entries are removed from the draw list
-                # RULE_4: If a choice wins, it can't be selected again so remove from draw list
-                # -------------------------------------------------------------------------------------
-                selection_list[:] = [e for e in selection_list if e.user_id != winner.user_id and e.name != winner.name]
-                # Output winner
-                await channel.send('**Winner is "{}"** entered by {}.'.format(winner.name, user.mention))
-                continue
-            else:
-                await channel.send('Unable to draw a winner. Something went wrong')
-                logger.error('Error drawing winner (winner, user): ({}, {})'.format(winner, user))
-                break
-
-        # Write wins to history table
+        draw = await compose_draw(output, guild, entries, count)
+        await output.send(channel, PRIORITY_DRAW)
+        if draw.exhausted:
+            return
+        winners_list = draw.winners
+
+        # Write wins to history table and clear the entries in one go
+        entry_hist = []
         if len(winners_list) > 0:
             for e in entries:
                 did_win = True if e in winners_list else False
-                await entryhistdb.create_entry_hist(e.name, did_win, e.guild_id, e.user_id)
+                entry_hist.append((e.name, did_win, e.guild_id, e.user_id))
+        if not await entryhistdb.finalize_draw(guild.id, entry_hist):
+            logger.error("Failed to save draw results for guild: {}".format(guild.id))
+        embed_cache.bump(guild.id)
+
+    def autodraw_enabled(self, guild: guildsdb.RespGuild) -> bool:
+        """Check if a guild is configured for autodraw
+
+        Args:
+            guild: the guild db tuple
+        """
+        return guild.channel_id > 0 and guild.autodraw_weekday > 0 and guild.autodraw_hour > 0
+
+    def next_autodraw_time(self, guild: guildsdb.RespGuild) -> datetime.datetime:
+        """Calculate when the next autodraw should run based on the guild's schedule
+
+        Args:
+            guild: the guild db tuple
 
-        await entriesdb.delete_all_entries_for_guild(guild.id)
+        Returns:
+            the next run time
+        """
+        now = datetime.datetime.now(self.timezone)
+        task_time = now + datetime.timedelta((guild.autodraw_weekday - now.weekday()) % 7)
+        task_time = task_time.replace(hour=guild.autodraw_hour, minute=0, second=0, microsecond=0)
+        if task_time <= now: # If day has already pass, move one week forward
+            task_time += datetime.timedelta(weeks=1)
+        return task_time
 
-    async def autodraw(self, guild: guildsdb.RespGuild):
-        """Run the autodraw on schedule
+    def schedule_autodraw(self, guild: guildsdb.RespGuild):
+        """Put the guild's next autodraw on the scheduler, up to 'autodraw_jitter' seconds late
 
         Args:
             guild: the guild db tuple
         """
-        try:
-            # Wait till bot is ready
-            await self.bot.wait_until_ready()
-            # Run while bot is still up
-            while not self.bot.is_closed():
-                # Calculate when the next run should be based on the autodraw schedule
-                now = datetime.datetime.now(self.timezone)
-                task_time = now + datetime.timedelta((guild.autodraw_weekday - now.weekday()) % 7)
-                task_time = task_time.replace(hour=guild.autodraw_hour, minute=0, second=0, microsecond=0)
-                if task_time < datetime.datetime.now(self.timezone): # If day has already pass, move one week forward
-                    task_time += datetime.timedelta(weeks=1)
-                # Sleep till the next run time
-                logger.info(f'Autodraw for guild ({guild.id}), scheduled for {task_time.strftime("%A, %d %B %Y %H:%M:%S")}')
-                await asyncio.sleep((task_time - datetime.datetime.now(self.timezone)).total_seconds())
-                # Check if bot is still in guild, if not remove it from db (guild must have not been removed from db)
-                guildobj = discord.utils.get(self.bot.guilds, id=guild.id)
-                if not guildobj:
-                    logger.info("Deleting old, invalid guild: {}".format(guild.id))
-                    await guildsdb.delete_one_guild(guild.id)
-                    return
-                # Run draw on guild if channel is set
-                if guild.channel_id > 0:
-                    logger.info("Running autodraw for guild: {}".format(guild.id))
-                    await self.run_draw(guild.id, guild.channel_id, NUM_DRAWS_DEFAULT)
-                else:
-                    logger.info("Can't run autodraw for guild: {}. Channel not set yet".format(guild.id))
-        except Exception as e:
-            logger.debug("Autodraw task exception: {}".format(e))
+        task_time = self.next_autodraw_time(guild)
+        if app_config["autodraw_jitter"] > 0:
+            task_time += datetime.timedelta(seconds=random.uniform(0, app_config["autodraw_jitter"]))
+        logger.info(f'Autodraw for guild ({guild.id}), scheduled for {task_time.strftime("%A, %d %B %Y %H:%M:%S")}')
+        self.autodraw_scheduler.schedule(guild.id, task_time.timestamp())
+
+    async def autodraw(self, guild_id: int):
+        """Run the autodraw for a guild when the scheduler fires it
+
+        Args:
+            guild_id: guild to run
+        """
+        guild = await guildsdb.read_one_guild_cached(guild_id)
+        if not guild or not self.autodraw_enabled(guild):
             return
+        # Check if bot is still in guild, if not remove it from db (guild must have not been removed from db)
+        guildobj = self.bot.get_guild(guild.id)
+        if not guildobj:
+            logger.info("Deleting old, invalid guild: {}".format(guild.id))
+            await guildsdb.delete_one_guild(guild.id)
+            return
+        # Queue the following week's run before running this one
+        self.schedule_autodraw(guild)
+        # Run draw on guild if channel is set
+        if guild.channel_id > 0:
+            logger.info("Running autodraw for guild: {}".format(guild.id))
+            await self.draw_executor.run(
+                    guild.id, self.run_draw, guild.id, guild.channel_id, NUM_DRAWS_DEFAULT)
+        else:
+            logger.info("Can't run autodraw for guild: {}. Channel not set yet".format(guild.id))
 
     async def start_autodraw(self, guild: guildsdb.RespGuild):
-        """Start autodraw task for guild making sure to stop previous task first
+        """Schedule autodraw for guild making sure to stop previous schedule first
 
         Args:
             guild: guild to start
@@ -171,27 +154,23 @@ class Draw(commands.Cog, name="draw"):
         # Stop first
         await self.stop_autodraw(guild.id)
         # Check if guild is configured for autodraw
-        if guild.channel_id > 0 and guild.autodraw_weekday > 0 and guild.autodraw_hour > 0:
-            logger.info("Starting auto draw task for guild: {}".format(guild.id))
-            self.autodraw_tasks[guild.id] = self.bot.loop.create_task(self.autodraw(guild))
+        if self.autodraw_enabled(guild):
+            logger.info("Starting auto draw for guild: {}".format(guild.id))
+            self.schedule_autodraw(guild)
 
     async def stop_autodraw(self, guild_id: int):
-        """Stop autodraw task for guild
+        """Stop autodraw for guild
 
         Args:
             guild: guild to stop
         """
-        if guild_id in self.autodraw_tasks and self.autodraw_tasks[guild_id] is not None:
-            logger.info("Stopping auto draw task for guild: {}".format(guild_id))
-            self.autodraw_tasks[guild_id].cancel()
-            self.autodraw_tasks[guild_id] = None
+        if guild_id in self.autodraw_scheduler:
+            logger.info("Stopping auto draw for guild: {}".format(guild_id))
+            self.autodraw_scheduler.cancel(guild_id)
 
     async def cog_unload(self) -> None:
         """ Cog builtin function that runs when cog is unload """
-        if self.autodraw_tasks:
-            for guild_id, task in self.autodraw_tasks.items():
-                if task is not None:
-                    await self.stop_autodraw(guild_id)
+        await self.autodraw_scheduler.stop()
 
     """
     Listeners
@@ -200,7 +179,8 @@ class Draw(commands.Cog, name="draw"):
     @commands.Cog.listener()
     async def on_ready(self):
         """ Cog builtin that runs when the cog is ready """
-        # Add separate task for each guild
+        # Schedule each guild on the shared scheduler
+        self.autodraw_scheduler.start()
         guilds = await guildsdb.read_all_guilds()
         if guilds:
             for guild in guilds:
@@ -218,7 +198,7 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_listen(self, ctx: Context) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
         # Create or update guild
@@ -231,10 +211,10 @@ class Draw(commands.Cog, name="draw"):
         if guild:
             # Success
             await self.start_autodraw(guild)
-            await ctx.send('Successfully set this channel as listening channel.')
+            await dispatcher.send(ctx, 'Successfully set this channel as listening channel.')
         else:
             # Failed
-            await ctx.send('Unable to set this channel as listening channel. Try again.')
+            await dispatcher.send(ctx, 'Unable to set this channel as listening channel. Try again.')
 
 
     @commands.hybrid_command(
@@ -245,10 +225,10 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_auto_enable(self, ctx: Context, weekday: int, hour: int) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
         if weekday < 0 or weekday > 6 or hour < 0 or hour > 23:
-            await ctx.send('<weekday> must be 0-6 and <hour> must be 0-23')
+            await dispatcher.send(ctx, '<weekday> must be 0-6 and <hour> must be 0-23')
             return
 
         # Create or update guild
@@ -261,11 +241,11 @@ class Draw(commands.Cog, name="draw"):
         if guild:
             # Success
             await self.start_autodraw(guild)
-            await ctx.send('Successfully enabled the autodraw to run every {} at {} ({} timezone)'.format(
+            await dispatcher.send(ctx, 'Successfully enabled the autodraw to run every {} at {} ({} timezone)'.format(
                 calendar.day_name[weekday], f"{hour%12 or 12} {'AM' if hour < 12 else 'PM'}", app_config["timezone"]))
         else:
             # Failed
-            await ctx.send('Unable to set autodraw schedule. Try again.')
+            await dispatcher.send(ctx, 'Unable to set autodraw schedule. Try again.')
 
     @commands.hybrid_command(
         name="draw_auto_disable",
@@ -275,7 +255,7 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_auto_disable(self, ctx: Context) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
         # Create or update guild
@@ -288,10 +268,10 @@ class Draw(commands.Cog, name="draw"):
         if guild:
             # Success
             await self.stop_autodraw(guild.id)
-            await ctx.send('Successfully disabled autodraw.')
+            await dispatcher.send(ctx, 'Successfully disabled autodraw.')
         else:
             # Failed
-            await ctx.send('Unable to disable autodraw. Try again.')
+            await dispatcher.send(ctx, 'Unable to disable autodraw. Try again.')
 
     @commands.hybrid_command(
         name="draw_list",
@@ -301,28 +281,34 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_list(self, ctx: Context) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
-        # Read all entries
-        entries = await entriesdb.read_all_entries_for_guild(ctx.guild.id)
-        if not entries:
-            await ctx.send('No entries found. Please enter some first with "!draw_enter".')
-            return
-        # Group entries by user
-        user_entries = defaultdict(list)
-        for entry in entries:
-            user_entries[entry.user_id].append(entry)
-        # Print draw entries table
-        embed = discord.Embed(title="Draw Entries", color=0x00ff00)
-        for user_id, entries in user_entries.items():
-            user = discord.utils.get(ctx.guild.members, id=int(user_id))
-            if user:
-                name = user.name
-                first_choice = next((x.name for x in entries if x.first), "")
-                second_choice = next((x.name for x in entries if not x.first), "")
-                embed.add_field(name=name, value=f"1: {first_choice}\n2: {second_choice}", inline=True)
-        await ctx.send(embed=embed)
+        # Reuse the table if nothing changed since it was last printed
+        version = embed_cache.version(ctx.guild.id)
+        embed = embed_cache.get(ctx.guild.id, "draw_list")
+        if embed is None:
+            # Read all entries
+            await entriesdb.flush_entries()
+            entries = await entriesdb.read_all_entries_for_guild_cached(ctx.guild.id)
+            if not entries:
+                await dispatcher.send(ctx, 'No entries found. Please enter some first with "!draw_enter".')
+                return
+            # Group entries by user
+            user_entries = defaultdict(list)
+            for entry in entries:
+                user_entries[entry.user_id].append(entry)
+            names = await member_cache.names(ctx.guild, user_entries.keys())
+            # Draw entries table
+            embed = discord.Embed(title="Draw Entries", color=0x00ff00)
+            for user_id, entries in user_entries.items():
+                name = names.get(int(user_id))
+                if name:
+                    first_choice = next((x.name for x in entries if x.first), "")
+                    second_choice = next((x.name for x in entries if not x.first), "")
+                    embed.add_field(name=name, value=f"1: {first_choice}\n2: {second_choice}", inline=True)
+            embed_cache.put(ctx.guild.id, "draw_list", version, embed)
+        await dispatcher.send(ctx, embed=embed, priority=PRIORITY_LOW)
 
     @commands.hybrid_command(
         name="draw_enter",
@@ -332,36 +318,23 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_enter(self, ctx: Context, choice1: str, choice2: str | None = None) -> None:
         if not ctx.guild or not ctx.author:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
         if choice2 != None and choice1.lower() == choice2.lower():
-            await ctx.send('Cannot select the same choice twice! Try again.')
+            await dispatcher.send(ctx, 'Cannot select the same choice twice! Try again.')
             return
 
-        err_msg = "Unable to create the draw entry. Please try again."
-        # Create user if not exists
-        if not await usersdb.user_exists(ctx.author.id):
-            if not await usersdb.create_one_user(ctx.author.id):
-                await ctx.send(err_msg)
-                return
-        # Create enrollment if not exists
-        if not await enrollmentsdb.enrollment_exists(ctx.guild.id, ctx.author.id):
-            if not await enrollmentsdb.create_one_enrollment(ctx.guild.id, ctx.author.id):
-                await ctx.send(err_msg)
-                return
-        # Remove old entries
-        if not await entriesdb.delete_all_entries_for_user_in_guild(ctx.guild.id, ctx.author.id):
-            await ctx.send(err_msg)
-            return
         # Create new entries (set all entries to lowercase for matching entries later)
+        names = [choice1.lower()] if choice2 is None else [choice1.lower(), choice2.lower()]
         response = 'Failed to enter your picks into the draw. Try again'
-        if await entriesdb.create_one_entry(choice1.lower(), True, ctx.guild.id, ctx.author.id):
+        if await entriesdb.submit_entries(ctx.guild.id, ctx.author.id, names):
+            embed_cache.bump(ctx.guild.id)
             response = '{} has entered their picks into the draw: "**{}**"'.format(ctx.author.mention, choice1)
-            if choice2 != None and await entriesdb.create_one_entry(choice2.lower(), False, ctx.guild.id, ctx.author.id):
+            if choice2 != None:
                 response += ' and "**{}**"'.format(choice2)
 
         # Send response
-        await ctx.send(response)
+        await dispatcher.send(ctx, response)
 
     @commands.hybrid_command(
         name="draw_leave",
@@ -371,11 +344,12 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_leave(self, ctx: Context) -> None:
         if not ctx.guild or not ctx.author:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
         await entriesdb.delete_all_entries_for_user_in_guild(ctx.guild.id, ctx.author.id)
-        await ctx.send('Removed your entries from the draw.')
+        embed_cache.bump(ctx.guild.id)
+        await dispatcher.send(ctx, 'Removed your entries from the draw.')
 
     @commands.hybrid_command(
         name="draw_now",
@@ -387,101 +361,108 @@ class Draw(commands.Cog, name="draw"):
     async def draw_now(self, ctx: Context, count: int | None) -> None:
         count = NUM_DRAWS_DEFAULT if count is None else count
         if not ctx.guild or not ctx.channel:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
         if count < 1 or count > NUM_DRAWS_MAX:
-            await ctx.send('"Count" must be a min of 1 and a max of {}.'.format(NUM_DRAWS_MAX))
+            await dispatcher.send(ctx, '"Count" must be a min of 1 and a max of {}.'.format(NUM_DRAWS_MAX))
             return
 
-        await self.run_draw(ctx.guild.id, ctx.channel.id, count)
+        await self.draw_executor.run(ctx.guild.id, self.run_draw, ctx.guild.id, ctx.channel.id, count)
 
     @commands.hybrid_command(
         name="draw_user_stats",
-        description="Print the draw stats for each user."
+        description="Print the draw stats for each user (ex. !draw_user_stats or !draw_user_stats last 12 weeks)."
     )
     @checks.in_channel()
     @checks.in_guild()
-    async def draw_user_stats(self, ctx: Context) -> None:
+    async def draw_user_stats(self, ctx: Context, *, window: str | None = None) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
+        since = None
+        if window:
+            try:
+                since = parse_window(window, self.timezone)
+            except (ValueError, OverflowError):
+                await dispatcher.send(ctx, 'Unknown time window. Use one of: {}.'.format(WINDOW_HELP))
+                return
 
-        # Read all entries history
-        entry_hist = await entryhistdb.read_all_entry_hist_for_guild(ctx.guild.id)
-        if not entry_hist:
-            await ctx.send('No user stats found. Please run a draw first with "!draw_now".')
-            return
-        # Group entries by user
-        user_entry_hist = defaultdict(list)
-        for entry in entry_hist:
-            user_entry_hist[entry.user_id].append(entry)
-        # Print stats
-        embed = discord.Embed(title="Historical User Stats", color=0x00ff00)
-        for user_id, entries in user_entry_hist.items():
-            user = discord.utils.get(ctx.guild.members, id=int(user_id))
-            if user:
-                # name
-                name = user.name
-                # wins
-                wins = len([e for e in entries if e.won])
-                # most common picks
-                counter = Counter([entry.name for entry in entries])
-                most_common_entry, most_common_count = counter.most_common(1)[0]
-                # last win date
-                datetime_objects = [parser.parse(x.created_at) for x in entries if x.won]
-                last_win_str = ""
-                if datetime_objects:
-                    last_win = max(datetime_objects)
-                    last_win_str = last_win.strftime("%m/%d/%Y")
-                # summary
-                embed.add_field(
-                        name=name,
-                        value=f"Wins: {wins}\nFavorite: {most_common_entry} ({most_common_count})\nLast win date: {last_win_str}",
-                        inline=False)
-        await ctx.send(embed=embed)
+        # Reuse the all time stats if nothing changed since they were last printed
+        # (windowed stats move with the clock so they're always read)
+        version = embed_cache.version(ctx.guild.id)
+        embed = embed_cache.get(ctx.guild.id, "draw_user_stats") if not window else None
+        if embed is None:
+            # Read user stats
+            user_stats = await statsdb.read_user_stats_for_guild(ctx.guild.id, since)
+            if not user_stats:
+                await dispatcher.send(ctx, 'No user stats found. Please run a draw first with "!draw_now".' if not window
+                               else 'No user stats found for "{}".'.format(window))
+                return
+            names = await member_cache.names(ctx.guild, (u.user_id for u in user_stats))
+            # Stats
+            title = "Historical User Stats" if not window else "User Stats ({})".format(window)
+            embed = discord.Embed(title=title, color=0x00ff00)
+            for stats in user_stats:
+                name = names.get(int(stats.user_id))
+                if name:
+                    # last win date
+                    last_win_str = ""
+                    if stats.last_win_at:
+                        last_win_str = stats.last_win_at.strftime("%m/%d/%Y")
+                    # summary
+                    embed.add_field(
+                            name=name,
+                            value=f"Wins: {stats.wins}\nFavorite: {stats.favorite} ({stats.favorite_count})\nLast win date: {last_win_str}",
+                            inline=False)
+            if not window:
+                embed_cache.put(ctx.guild.id, "draw_user_stats", version, embed)
+        await dispatcher.send(ctx, embed=embed, priority=PRIORITY_LOW)
 
     @commands.hybrid_command(
         name="draw_entry_stats",
-        description="Print the draw stats for each entry."
+        description="Print the draw stats for each entry (ex. !draw_entry_stats or !draw_entry_stats last 12 weeks)."
     )
     @checks.in_channel()
     @checks.in_guild()
-    async def draw_entry_stats(self, ctx: Context) -> None:
+    async def draw_entry_stats(self, ctx: Context, *, window: str | None = None) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
+        since = None
+        if window:
+            try:
+                since = parse_window(window, self.timezone)
+            except (ValueError, OverflowError):
+                await dispatcher.send(ctx, 'Unknown time window. Use one of: {}.'.format(WINDOW_HELP))
+                return
 
-        # Read all entries history
-        entry_hist = await entryhistdb.read_all_entry_hist_for_guild(ctx.guild.id)
-        if not entry_hist:
-            await ctx.send('No user stats found. Please run a draw first with "!draw_now".')
-            return
-        # Group entries by entry name
-        entry_name_hist = defaultdict(list)
-        for entry in entry_hist:
-            entry_name_hist[entry.name].append(entry)
-        # Print stats
-        embed = discord.Embed(title="Historical Entry Stats", color=0x00ff00)
-        for name, entries in entry_name_hist.items():
-            # most picked by user
-            counter = Counter([entry.user_id for entry in entries])
-            most_picked_by, most_picked_by_count = counter.most_common(1)[0]
-            username = ""
-            user = discord.utils.get(ctx.guild.members, id=int(most_picked_by))
-            if user:
-                username = user.name
-            # wins
-            wins = len([e for e in entries if e.won])
-            # last picked date
-            datetime_objects = [parser.parse(x.created_at) for x in entries]
-            last_win = max(datetime_objects)
-            last_win_str = last_win.strftime("%m/%d/%Y")
-            # summary
-            embed.add_field(
-                    name=name,
-                    value=f"Wins: {wins}\nBiggest fan: {username} ({most_picked_by_count})\nLast pick date: {last_win_str}",
-                    inline=False)
-        await ctx.send(embed=embed)
+        # Reuse the all time stats if nothing changed since they were last printed
+        # (windowed stats move with the clock so they're always read)
+        version = embed_cache.version(ctx.guild.id)
+        embed = embed_cache.get(ctx.guild.id, "draw_entry_stats") if not window else None
+        if embed is None:
+            # Read entry stats
+            entry_stats = await statsdb.read_entry_stats_for_guild(ctx.guild.id, since)
+            if not entry_stats:
+                await dispatcher.send(ctx, 'No entry stats found. Please run a draw first with "!draw_now".' if not window
+                               else 'No entry stats found for "{}".'.format(window))
+                return
+            names = await member_cache.names(ctx.guild, (e.biggest_fan for e in entry_stats if e.biggest_fan))
+            # Stats
+            title = "Historical Entry Stats" if not window else "Entry Stats ({})".format(window)
+            embed = discord.Embed(title=title, color=0x00ff00)
+            for stats in entry_stats:
+                username = names.get(int(stats.biggest_fan or 0), "")
+                # last picked date
+                last_pick_str = stats.last_pick_at.strftime("%m/%d/%Y")
+                # summary
+                embed.add_field(
+                        name=stats.name,
+                        value=f"Wins: {stats.wins}\nBiggest fan: {username} ({stats.biggest_fan_count})\nLast pick date: {last_pick_str}",
+                        inline=False)
+            if not window:
+                embed_cache.put(ctx.guild.id, "draw_entry_stats", version, embed)
+        await dispatcher.send(ctx, embed=embed, priority=PRIORITY_LOW)
 
     @commands.hybrid_command(
         name="draw_entry_rename",
@@ -491,14 +472,15 @@ class Draw(commands.Cog, name="draw"):
     @checks.in_guild()
     async def draw_entry_rename(self, ctx: Context, old: str, new: str) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
         # Update
         if await entryhistdb.update_all_entry_hist_in_guild_by_name(ctx.guild.id, old, new):
-            await ctx.send('Successfully renamed entry in the history.')
+            embed_cache.bump(ctx.guild.id)
+            await dispatcher.send(ctx, 'Successfully renamed entry in the history.')
         else:
-            await ctx.send('Failed to rename entry in the history.')
+            await dispatcher.send(ctx, 'Failed to rename entry in the history.')
 
 async def setup(bot):
     await bot.add_cog(Draw(bot))
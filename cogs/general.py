@@ -7,6 +7,7 @@ from discord.ext.commands import Context
 
 import database.controllers.guilds as guildsdb
 from helpers import checks
+from helpers.dispatcher import dispatcher, PRIORITY_LOW
 from helpers.config import config as app_config
 
 class General(commands.Cog, name="general"):
@@ -36,7 +37,7 @@ class General(commands.Cog, name="general"):
             help_text = '\n'.join(data)
             embed.add_field(name=f'__{i.capitalize()}__',
                             value=f'{help_text}', inline=False)
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed, priority=PRIORITY_LOW)
 
     @commands.hybrid_command(
         name="info",
@@ -45,12 +46,12 @@ class General(commands.Cog, name="general"):
     @checks.in_guild()
     async def info(self, ctx: Context) -> None:
         if not ctx.guild:
-            await ctx.send('Something went wrong. Try again later.')
+            await dispatcher.send(ctx, 'Something went wrong. Try again later.')
             return
 
         # Autodraw day
         autodraw = "Not scheduled."
-        guild = await guildsdb.read_one_guild(ctx.guild.id)
+        guild = await guildsdb.read_one_guild_cached(ctx.guild.id)
         if guild:
             autodraw_weekday = guild.autodraw_weekday
             autodraw_hour = guild.autodraw_hour
@@ -79,7 +80,7 @@ class General(commands.Cog, name="general"):
         embed.set_footer(
             text=f"Requested by {ctx.author}"
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
 
     @commands.hybrid_command(
         name="invite",
@@ -92,10 +93,10 @@ class General(commands.Cog, name="general"):
             color=0xD75BF4
         )
         try:
-            await ctx.author.send(embed=embed)
-            await ctx.send("I sent you a private message!")
+            await dispatcher.send(ctx.author, embed=embed)
+            await dispatcher.send(ctx, "I sent you a private message!")
         except discord.Forbidden:
-            await ctx.send(embed=embed)
+            await dispatcher.send(ctx, embed=embed)
 
 async def setup(bot):
     await bot.add_cog(General(bot))
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import platform
 import subprocess
 import datetime
@@ -8,17 +9,45 @@ import discord
 from discord.ext import commands
 from discord.ext.commands import Context
 
+import database.controllers.guilds as guildsdb
+import database.controllers.stats as statsdb
+import database.controllers.transfer as transferdb
 from helpers import checks
+from helpers.db import DATABASE_PATH
+from helpers.backup import BackupManager
+from helpers.dispatcher import dispatcher
+from helpers.embed_cache import embed_cache
+from helpers.output import MessageBuffer
+from helpers.query_stats import query_tracker
 from helpers.logger import logger, LOG_FILE_NAME
 from helpers.config import config as app_config
 
 MAX_LOG_LINES = 50
+SLOW_QUERIES_DEFAULT = 10
+SLOW_QUERIES_MAX = 50
+SLOW_QUERY_SQL_LENGTH = 500
+EXPORTS_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/exports"
+# Largest export that is attached to the reply instead of only left on disk
+MAX_EXPORT_UPLOAD_BYTES = 8 * 1024 * 1024
 
 class Owner(commands.Cog, name="owner"):
     def __init__(self, bot):
         self.bot = bot
         self.timezone = pytz.timezone(app_config["timezone"])
         self.start_time = datetime.datetime.now(self.timezone)
+        self.backups = BackupManager(DATABASE_PATH, app_config["backup_keep"])
+        self.backup_task = None
+
+    async def cog_load(self) -> None:
+        """ Cog builtin function that runs when cog is loaded """
+        if app_config["backup_interval_hours"] > 0:
+            self.backup_task = asyncio.create_task(
+                    self.backups.schedule(datetime.timedelta(hours=app_config["backup_interval_hours"])))
+
+    async def cog_unload(self) -> None:
+        """ Cog builtin function that runs when cog is unload """
+        if self.backup_task:
+            self.backup_task.cancel()
 
     async def check_git_dirty_status(self) -> tuple[bool, str]:
         """Check whether the code running is the same as the remote code on github
@@ -103,10 +132,43 @@ class Owner(commands.Cog, name="owner"):
             value=git_dirty_status,
             inline = True
         )
+        send_stats = dispatcher.stats()
+        embed.add_field(
+            name="Outbound queue:",
+            value="{} queued {}, {} sent, {} coalesced, {} failed (avg wait {:.2f}s, max wait {:.2f}s)".format(
+                send_stats.queued, send_stats.queued_by_priority, send_stats.sent, send_stats.coalesced,
+                send_stats.failed, send_stats.avg_wait, send_stats.max_wait),
+            inline = True
+        )
+        cache_stats = embed_cache.stats()
+        embed.add_field(
+            name="Embed cache:",
+            value="{} embeds, {}/{} KB, {} hits, {} misses".format(
+                cache_stats.embeds, cache_stats.size // 1024, cache_stats.max_size // 1024,
+                cache_stats.hits, cache_stats.misses),
+            inline = True
+        )
+        draw_cog = self.bot.get_cog("draw")
+        if draw_cog:
+            stats = draw_cog.draw_executor.stats()
+            embed.add_field(
+                name="Draw queue:",
+                value="{} queued, {} running, {} done (avg wait {:.2f}s, max wait {:.2f}s)".format(
+                    stats.queued, stats.in_flight, stats.completed, stats.avg_wait, stats.max_wait),
+                inline = True
+            )
+            schedule_stats = draw_cog.autodraw_scheduler.stats()
+            embed.add_field(
+                name="Autodraw queue:",
+                value="{} due, {} running, {} fired (avg lag {:.2f}s, max lag {:.2f}s)".format(
+                    schedule_stats.due, schedule_stats.running, schedule_stats.fired,
+                    schedule_stats.avg_lag, schedule_stats.max_lag),
+                inline = True
+            )
         embed.set_footer(
             text=f"Requested by {ctx.author}"
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
 
     @commands.hybrid_command(
         name="owner_show_logs",
@@ -115,7 +177,7 @@ class Owner(commands.Cog, name="owner"):
     @checks.is_owner()
     async def owner_show_logs(self, ctx: Context, num_lines: int) -> None:
         if num_lines > MAX_LOG_LINES:
-            await ctx.send('Can only show up to a maximum of {} lines.'.format(MAX_LOG_LINES))
+            await dispatcher.send(ctx, 'Can only show up to a maximum of {} lines.'.format(MAX_LOG_LINES))
             return
 
         current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -130,17 +192,127 @@ class Owner(commands.Cog, name="owner"):
                     # Send output in 5 line chucks (discord message content limitation)
                     output += f'{line.strip()}\n'
                     if i % lines_per_chunk == 0:
-                        await ctx.send(f'```{output}```')
+                        await dispatcher.send(ctx, f'```{output}```')
                         output = ""
                 # Send the last lines if there are more
                 if output:
-                    await ctx.send(f'```{output}```')
+                    await dispatcher.send(ctx, f'```{output}```')
         except FileNotFoundError as e:
             logger.error(e)
-            await ctx.send("File not found!")
+            await dispatcher.send(ctx, "File not found!")
         except Exception as e:
             logger.error(e)
-            await ctx.send("An error occurred while reading the file.")
+            await dispatcher.send(ctx, "An error occurred while reading the file.")
+
+    @commands.hybrid_command(
+        name="owner_rebuild_stats",
+        description="Rebuild the draw stats from the history (!owner_rebuild_stats or !owner_rebuild_stats <guild_id>).",
+    )
+    @checks.is_owner()
+    async def owner_rebuild_stats(self, ctx: Context, guild_id: int | None = None) -> None:
+        if await statsdb.rebuild_stats(guild_id):
+            if guild_id is None:
+                embed_cache.bump_all()
+            else:
+                embed_cache.bump(guild_id)
+            await dispatcher.send(ctx, 'Successfully rebuilt the draw stats.')
+        else:
+            await dispatcher.send(ctx, 'Failed to rebuild the draw stats.')
+
+    @commands.hybrid_command(
+        name="owner_slow_queries",
+        description="Show the slowest db statements since startup (!owner_slow_queries or !owner_slow_queries <count>).",
+    )
+    @checks.is_owner()
+    async def owner_slow_queries(self, ctx: Context, count: int | None = None) -> None:
+        count = SLOW_QUERIES_DEFAULT if count is None else count
+        if count < 1 or count > SLOW_QUERIES_MAX:
+            await dispatcher.send(ctx, '"Count" must be a min of 1 and a max of {}.'.format(SLOW_QUERIES_MAX))
+            return
+        output = MessageBuffer()
+        waits = query_tracker.wait_stats()
+        output.add_line('Connection waits: {} (avg {:.1f} ms, max {:.1f} ms)'.format(
+            waits.waits, 1000 * waits.total_time / waits.waits if waits.waits else 0, 1000 * waits.max_time))
+        lines = []
+        for stats in query_tracker.slowest(count):
+            lines.append('**max {:.1f} ms, avg {:.1f} ms, {} calls, {} rows**\n`{}`'.format(
+                1000 * stats.max_time, 1000 * stats.total_time / max(stats.calls, 1), stats.calls, stats.rows,
+                stats.sql[:SLOW_QUERY_SQL_LENGTH]))
+        if lines:
+            output.add_embed("Slowest db statements", lines)
+        await output.send(ctx)
+
+    @commands.hybrid_command(
+        name="owner_export",
+        description="Export the draw data (!owner_export or !owner_export <guild_id>).",
+    )
+    @checks.is_owner()
+    async def owner_export(self, ctx: Context, guild_id: int | None = None) -> None:
+        os.makedirs(EXPORTS_PATH, exist_ok=True)
+        filename = "export-{}{}.ndjson.gz".format(
+            datetime.datetime.now(self.timezone).strftime("%Y%m%d-%H%M%S"),
+            f"-{guild_id}" if guild_id else "")
+        path = os.path.join(EXPORTS_PATH, filename)
+        result = await transferdb.export_guilds(path, [guild_id] if guild_id else None)
+        if result is None:
+            await dispatcher.send(ctx, 'Failed to export the draw data.')
+            return
+        message = 'Exported {} guilds ({} rows) to "{}".'.format(len(result.guild_ids), result.rows, filename)
+        if os.path.getsize(path) <= MAX_EXPORT_UPLOAD_BYTES:
+            await dispatcher.send(ctx, message, file=discord.File(path))
+        else:
+            await dispatcher.send(ctx, message)
+
+    @commands.hybrid_command(
+        name="owner_import",
+        description="Import an export from the exports folder, replacing its guilds' data (!owner_import <filename>).",
+    )
+    @checks.is_owner()
+    async def owner_import(self, ctx: Context, filename: str) -> None:
+        # Only allow files directly in the exports folder
+        path = os.path.join(EXPORTS_PATH, os.path.basename(filename))
+        if not os.path.isfile(path):
+            await dispatcher.send(ctx, 'Export "{}" not found.'.format(os.path.basename(filename)))
+            return
+        result = await transferdb.import_guilds(path)
+        if result is None:
+            await dispatcher.send(ctx, 'Failed to import the draw data.')
+            return
+        for guild_id in result.guild_ids:
+            embed_cache.bump(guild_id)
+        # Pick up the imported guild configs and autodraw schedules
+        await guildsdb.load_guild_cache()
+        draw_cog = self.bot.get_cog("draw")
+        if draw_cog:
+            for guild_id in result.guild_ids:
+                guild = await guildsdb.read_one_guild_cached(guild_id)
+                if guild:
+                    await draw_cog.start_autodraw(guild)
+        await dispatcher.send(ctx, 'Imported {} guilds ({} rows).'.format(len(result.guild_ids), result.rows))
+
+    @commands.hybrid_command(
+        name="owner_backup",
+        description="Take a backup of the database now (or show the running backup's progress).",
+    )
+    @checks.is_owner()
+    async def owner_backup(self, ctx: Context) -> None:
+        def progress_str() -> str:
+            progress = self.backups.progress()
+            done = progress.pages_total - progress.pages_remaining
+            percent = 100 * done / progress.pages_total if progress.pages_total else 0
+            return 'Backing up the database: {}/{} pages ({:.0f}%)'.format(done, progress.pages_total, percent)
+
+        message = await dispatcher.send(ctx, 'Starting the database backup...')
+        task = asyncio.create_task(self.backups.run())
+        while not task.done():
+            await asyncio.wait({task}, timeout=2)
+            if not task.done():
+                await message.edit(content=progress_str())
+        path = task.result()
+        if path:
+            await message.edit(content='Backed up the database to "{}".'.format(os.path.basename(path)))
+        else:
+            await message.edit(content='Failed to back up the database.')
 
 async def setup(bot):
     await bot.add_cog(Owner(bot))
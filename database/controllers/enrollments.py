@@ -1,34 +1,33 @@
 from collections import namedtuple
 
-import aiosqlite
-
 from helpers.logger import logger
-from helpers.db import DATABASE_PATH
+from helpers.db import connection, record_factory, execute, fetch_all, fetch_one
 
 """
 Response Types
 """
 
 RespEnrollment = namedtuple('RespEnrollment', 'guild_id user_id')
+_enrollment_row = record_factory(RespEnrollment)
 
 """
 Functions
 """
 
 async def enrollment_exists(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            cursor = await db.cursor()
-            await cursor.execute("SELECT 1 FROM enrollments WHERE guild_id=? AND user_id=?", (guild_id, user_id))
-            return await cursor.fetchone() is not None
+            return await fetch_one(
+                    db, "SELECT 1 FROM enrollments WHERE guild_id=? AND user_id=?", (guild_id, user_id)) is not None
         except Exception as e:
             logger.error(e)
             return False
 
 async def create_one_enrollment(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute(
+            await execute(
+                    db,
                     "INSERT INTO enrollments(guild_id, user_id) VALUES (?, ?)",
                     (guild_id, user_id,))
             await db.commit()
@@ -38,39 +37,33 @@ async def create_one_enrollment(guild_id: int, user_id: int) -> bool:
             return False
 
 async def read_all_enrollments() -> list[RespEnrollment] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT guild_id, user_id FROM enrollments")
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEnrollment(row[0], row[1]))
-                return result_list
+            return await fetch_all(
+                    db,
+                    "SELECT guild_id, user_id FROM enrollments",
+                    (),
+                    _enrollment_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_one_enrollment(guild_id: int, user_id: int) -> RespEnrollment | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_one(
+                    db,
                     "SELECT guild_id, user_id FROM enrollments WHERE guild_id=? AND user_id=?",
-                    (guild_id, user_id,))
-            async with rows as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return RespEnrollment(row[0], row[1])
-                return None
+                    (guild_id, user_id,),
+                    _enrollment_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def delete_all_enrollments() -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM enrollments")
+            await execute(db, "DELETE FROM enrollments")
             await db.commit()
             return True
         except Exception as e:
@@ -78,10 +71,9 @@ async def delete_all_enrollments() -> bool:
             return False
 
 async def delete_one_enrollment(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM enrollments WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
+            await execute(db, "DELETE FROM enrollments WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
             await db.commit()
             return True
         except Exception as e:
@@ -3,13 +3,189 @@ from collections import namedtuple
 import aiosqlite
 
 from helpers.logger import logger
-from helpers.db import DATABASE_PATH
+from helpers.db import connection, record_factory, execute, executemany, fetch_all
+from helpers.group_commit import GroupCommitter
 
 """
 Response Types
 """
 
 RespEntry = namedtuple('RespEntry', 'name first guild_id user_id')
+_entry_row = record_factory(RespEntry, (None, bool, None, None))
+
+"""
+Helpers
+"""
+
+async def _submit_entries(db: aiosqlite.Connection, guild_id: int, user_id: int, names: list[str]):
+    await execute(db, "INSERT INTO users(id) VALUES (?) ON CONFLICT DO NOTHING", (user_id,))
+    await execute(
+            db,
+            "INSERT INTO enrollments(guild_id, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING",
+            (guild_id, user_id,))
+    await _leave_entries(db, guild_id, user_id)
+    await executemany(
+            db,
+            "INSERT INTO entries(name, first, guild_id, user_id) VALUES (?, ?, ?, ?)",
+            [(name, i == 0 and 1 or 0, guild_id, user_id) for i, name in enumerate(names)])
+
+async def _leave_entries(db: aiosqlite.Connection, guild_id: int, user_id: int):
+    await execute(db, "DELETE FROM entries WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
+
+"""
+Cache
+"""
+
+# Process wide pool of each guild's live entries by user, in submission order. A
+# guild is loaded the first time it's read and then written through by the
+# functions below, so listing and drawing don't read the db. Writes bump the
+# guild's generation (or the epoch, for all guilds) so a load that raced with a
+# write isn't kept.
+_pool: dict[int, dict[int, list[RespEntry]]] = {}
+_pool_generation: dict[int, int] = {}
+_pool_epoch = 0
+
+def _pool_version(guild_id: int) -> tuple[int, int]:
+    return _pool_epoch, _pool_generation.get(guild_id, 0)
+
+def _pool_changed(guild_id: int):
+    _pool_generation[guild_id] = _pool_generation.get(guild_id, 0) + 1
+
+def _pool_set_user(guild_id: int, user_id: int, names: list[str]):
+    _pool_changed(guild_id)
+    if guild_id in _pool:
+        _pool[guild_id][user_id] = [RespEntry(name, i == 0, guild_id, user_id) for i, name in enumerate(names)]
+
+def _pool_remove_user(guild_id: int, user_id: int):
+    _pool_changed(guild_id)
+    if guild_id in _pool:
+        _pool[guild_id].pop(user_id, None)
+
+def _group_by_user(entries: list[RespEntry]) -> dict[int, list[RespEntry]]:
+    users = {}
+    for entry in entries:
+        users.setdefault(entry.user_id, []).append(entry)
+    # First choices first, as they were submitted
+    for user_entries in users.values():
+        user_entries.sort(key=lambda e: not e.first)
+    return users
+
+def invalidate_entry_pool(guild_id: int | None = None):
+    """Drop a guild's entries from the pool so they're read again from the db
+
+    Args:
+        guild_id: guild to drop, or None for all guilds
+    """
+    global _pool_epoch
+    if guild_id is None:
+        _pool_epoch += 1
+        _pool.clear()
+    else:
+        _pool_changed(guild_id)
+        _pool.pop(guild_id, None)
+
+def clear_entry_pool(guild_id: int | None = None):
+    """Mark a guild's entries as all deleted, without reading them again from the db
+
+    Args:
+        guild_id: guild that was cleared, or None for all guilds
+    """
+    global _pool_epoch
+    if guild_id is None:
+        _pool_epoch += 1
+        for users in _pool.values():
+            users.clear()
+    else:
+        _pool_changed(guild_id)
+        _pool[guild_id] = {}
+
+async def read_all_entries_for_guild_cached(guild_id: int) -> list[RespEntry] | None:
+    """Read a guild's entries from the pool, loading them from the db the first time"""
+    users = _pool.get(guild_id)
+    if users is None:
+        version = _pool_version(guild_id)
+        entries = await read_all_entries_for_guild(guild_id)
+        if entries is None:
+            return None
+        users = _group_by_user(entries)
+        if _pool_version(guild_id) == version:
+            _pool[guild_id] = users
+    return [entry for user_entries in users.values() for entry in user_entries]
+
+def _pool_user_summary(user_entries) -> tuple[str | None, str | None, int]:
+    first = next((e.name for e in user_entries if e.first), None)
+    second = next((e.name for e in user_entries if not e.first), None)
+    return first, second, len(user_entries)
+
+async def verify_entry_pool() -> list[int] | None:
+    """Compare each pooled guild's entries to the db, dropping guilds that don't match
+
+    Each user's (first, second) picks are compared. Only pooled guilds are checked,
+    and guilds are pooled as they're read, so this checks guilds kept across a
+    reconnect, not a fresh start.
+
+    Returns:
+        ids of the guilds that didn't match
+    """
+    versions = {guild_id: _pool_version(guild_id) for guild_id in _pool}
+    async with connection() as db:
+        try:
+            rows = await fetch_all(
+                    db,
+                    """SELECT guild_id, user_id, MAX(CASE WHEN first THEN name END),
+                      MAX(CASE WHEN NOT first THEN name END), COUNT(*)
+                    FROM entries GROUP BY guild_id, user_id""",
+                    ())
+        except Exception as e:
+            logger.error(e)
+            return None
+    by_guild = {}
+    for guild_id, user_id, first, second, count in rows:
+        by_guild.setdefault(guild_id, {})[user_id] = (first, second, count)
+    diverged = []
+    for guild_id, users in list(_pool.items()):
+        if _pool_version(guild_id) != versions.get(guild_id):
+            # Written to while reading, it's checked again next time
+            continue
+        pooled = {user_id: _pool_user_summary(user_entries) for user_id, user_entries in users.items()}
+        if pooled != by_guild.get(guild_id, {}):
+            diverged.append(guild_id)
+            invalidate_entry_pool(guild_id)
+    return diverged
+
+"""
+Group commit
+
+When enabled, entry submissions and removals are queued and committed together in
+one transaction (see helpers.group_commit). Readers that need every submission so
+far, like a draw, flush the queue first.
+"""
+
+_committer: GroupCommitter | None = None
+
+def start_group_commit(interval: float, max_ops: int):
+    """Queue entry writes and commit them together
+
+    Args:
+        interval: longest time a write waits for others, in seconds
+        max_ops: most writes per transaction
+    """
+    global _committer
+    if _committer is None:
+        _committer = GroupCommitter(interval, max_ops)
+        _committer.start()
+
+async def stop_group_commit():
+    """Commit the queued entry writes and go back to committing each one"""
+    global _committer
+    if _committer is not None:
+        committer, _committer = _committer, None
+        await committer.stop()
+
+async def flush_entries():
+    """Wait until all entry writes submitted so far are committed"""
+    if _committer is not None:
+        await _committer.flush()
 
 """
 Functions
@@ -20,91 +196,113 @@ async def create_one_entry(
         first: bool,
         guild_id: int,
         user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute(
+            await execute(
+                    db,
                     "INSERT INTO entries(name, first, guild_id, user_id) VALUES (?, ?, ?, ?)",
                     (name, first and 1 or 0, guild_id, user_id,))
             await db.commit()
+            invalidate_entry_pool(guild_id)
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
+async def submit_entries(guild_id: int, user_id: int, names: list[str]) -> bool:
+    """Replace a user's entries in a guild in one transaction, adding the user and
+    their enrollment if needed
+
+    Args:
+        guild_id: guild to enter
+        user_id: user entering
+        names: picks in order, the first is the first choice
+    """
+    if _committer is not None:
+        if not await _committer.submit(_submit_entries, guild_id, user_id, names):
+            return False
+        _pool_set_user(guild_id, user_id, names)
+        return True
+    async with connection() as db:
+        try:
+            await execute(db, "BEGIN IMMEDIATE")
+            await _submit_entries(db, guild_id, user_id, names)
+            await db.commit()
+            _pool_set_user(guild_id, user_id, names)
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def read_all_entries() -> list[RespEntry] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT name, first, guild_id, user_id FROM entries")
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntry(row[0], bool(row[1]), row[2], row[3]))
-                return result_list
+            return await fetch_all(
+                    db,
+                    "SELECT name, first, guild_id, user_id FROM entries",
+                    (),
+                    _entry_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_all_entries_for_guild(guild_id: int) -> list[RespEntry] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_all(
+                    db,
                     "SELECT name, first, guild_id, user_id FROM entries WHERE guild_id=?",
-                    (guild_id,))
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntry(row[0], bool(row[1]), row[2], row[3]))
-                return result_list
+                    (guild_id,),
+                    _entry_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_all_entries_for_user_in_guild(guild_id: int, user_id: int) -> list[RespEntry] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_all(
+                    db,
                     "SELECT name, first, guild_id, user_id FROM entries WHERE guild_id=? AND user_id=?",
-                    (guild_id, user_id,))
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntry(row[0], bool(row[1]), row[2], row[3]))
-                return result_list
+                    (guild_id, user_id,),
+                    _entry_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def delete_all_entries() -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entries")
+            await execute(db, "DELETE FROM entries")
             await db.commit()
+            clear_entry_pool()
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def delete_all_entries_for_guild(guild_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entries WHERE guild_id=?", (guild_id,))
+            await execute(db, "DELETE FROM entries WHERE guild_id=?", (guild_id,))
             await db.commit()
+            clear_entry_pool(guild_id)
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def delete_all_entries_for_user_in_guild(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    if _committer is not None:
+        if not await _committer.submit(_leave_entries, guild_id, user_id):
+            return False
+        _pool_remove_user(guild_id, user_id)
+        return True
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entries WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
+            await _leave_entries(db, guild_id, user_id)
             await db.commit()
+            _pool_remove_user(guild_id, user_id)
             return True
         except Exception as e:
             logger.error(e)
@@ -1,15 +1,45 @@
+import datetime
 from collections import namedtuple
+from typing import AsyncIterator
 
 import aiosqlite
 
+import database.controllers.entries as entriesdb
+import database.controllers.stats as statsdb
 from helpers.logger import logger
-from helpers.db import DATABASE_PATH
+from helpers.db import connection, record_factory, execute, executemany, fetch_all, fetch_one, stream, from_epoch, to_epoch
 
 """
 Response Types
 """
 
 RespEntryHist = namedtuple('RespEntryHist', 'name won guild_id user_id created_at')
+_entry_hist_row = record_factory(RespEntryHist, (None, bool, None, None, from_epoch))
+# Rows of a page, 'cursor' is passed back to get the next page and is None after the last page
+RespEntryHistPage = namedtuple('RespEntryHistPage', 'rows cursor')
+
+PAGE_SIZE_DEFAULT = 500
+
+"""
+Helpers
+"""
+
+async def insert_entry_hist(db: aiosqlite.Connection, entry_hist: list[tuple[str, bool, int, int]]):
+    """Insert history rows and fold them into the stats (doesn't commit)
+
+    Args:
+        db: connection to use, a write transaction is started if one isn't open
+        entry_hist: (name, won, guild_id, user_id) rows
+    """
+    if not db.in_transaction:
+        await execute(db, "BEGIN IMMEDIATE")
+    row = await fetch_one(db, "SELECT COALESCE(MAX(rowid), 0) FROM entry_hist", ())
+    last_rowid = row[0] if row else 0
+    await executemany(
+            db,
+            "INSERT INTO entry_hist(name, won, guild_id, user_id) VALUES (?, ?, ?, ?)",
+            [(name, won and 1 or 0, guild_id, user_id) for name, won, guild_id, user_id in entry_hist])
+    await statsdb.refresh_stats(db, None, last_rowid)
 
 """
 Functions
@@ -20,68 +50,173 @@ async def create_entry_hist(
         won: bool,
         guild_id: int,
         user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
+        try:
+            await insert_entry_hist(db, [(name, won, guild_id, user_id)])
+            await db.commit()
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
+async def create_many_entry_hist(entry_hist: list[tuple[str, bool, int, int]]) -> bool:
+    """Insert many history rows in one transaction
+
+    Args:
+        entry_hist: (name, won, guild_id, user_id) rows
+    """
+    async with connection() as db:
+        try:
+            await insert_entry_hist(db, entry_hist)
+            await db.commit()
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
+async def finalize_draw(guild_id: int, entry_hist: list[tuple[str, bool, int, int]]) -> bool:
+    """Write the draw results to the history and stats and clear the guild's entries atomically
+
+    Args:
+        guild_id: guild the draw ran in
+        entry_hist: (name, won, guild_id, user_id) rows to write
+    """
+    async with connection() as db:
         try:
-            await db.execute(
-                    "INSERT INTO entry_hist(name, won, guild_id, user_id) VALUES (?, ?, ?, ?)",
-                    (name, won and 1 or 0, guild_id, user_id,))
+            await insert_entry_hist(db, entry_hist)
+            await execute(db, "DELETE FROM entries WHERE guild_id=?", (guild_id,))
             await db.commit()
+            entriesdb.clear_entry_pool(guild_id)
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def read_all_entry_hist() -> list[RespEntryHist] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT name, won, guild_id, user_id, created_at FROM entry_hist")
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntryHist(row[0], bool(row[1]), row[2], row[3], row[4]))
-                return result_list
+            return await fetch_all(
+                    db,
+                    "SELECT name, won, guild_id, user_id, created_at FROM entry_hist",
+                    (),
+                    _entry_hist_row)
         except Exception as e:
             logger.error(e)
             return None
 
+def stream_all_entry_hist() -> AsyncIterator[RespEntryHist]:
+    """Stream the whole history without loading it all into memory"""
+    return stream("SELECT name, won, guild_id, user_id, created_at FROM entry_hist", (), _entry_hist_row)
+
+async def read_entry_hist_page(
+        guild_id: int,
+        cursor: tuple[int, int] | None = None,
+        limit: int = PAGE_SIZE_DEFAULT,
+        user_id: int | None = None,
+        name: str | None = None,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None) -> RespEntryHistPage | None:
+    """Read one page of a guild's history, oldest first
+
+    Pages are keyed on (created_at, rowid) so each page is an index range read no
+    matter how deep into the history it is.
+
+    Args:
+        guild_id: guild to read
+        cursor: cursor of the previous page, or None for the first page
+        limit: max rows in the page
+        user_id: only this user's rows
+        name: only this entry's rows
+        since: only rows drawn at or after this time
+        until: only rows drawn before this time
+    """
+    sql = "SELECT rowid, name, won, guild_id, user_id, created_at FROM entry_hist WHERE guild_id=?"
+    params = [guild_id]
+    if user_id is not None:
+        sql += " AND user_id=?"
+        params.append(user_id)
+    if name is not None:
+        sql += " AND name=?"
+        params.append(name)
+    if since is not None:
+        sql += " AND created_at>=?"
+        params.append(to_epoch(since))
+    if until is not None:
+        sql += " AND created_at<?"
+        params.append(to_epoch(until))
+    if cursor is not None:
+        sql += " AND (created_at, rowid) > (?, ?)"
+        params += [cursor[0], cursor[1]]
+    sql += " ORDER BY created_at, rowid LIMIT ?"
+    params.append(limit)
+    async with connection() as db:
+        try:
+            rows = await fetch_all(db, sql, tuple(params), lambda c, row: (row, _entry_hist_row(c, row[1:])))
+            next_cursor = None
+            if len(rows) == limit:
+                last = rows[-1][0]
+                next_cursor = (last[5], last[0])
+            return RespEntryHistPage([r[1] for r in rows], next_cursor)
+        except Exception as e:
+            logger.error(e)
+            return None
+
+async def iter_entry_hist(
+        guild_id: int,
+        page_size: int = PAGE_SIZE_DEFAULT,
+        user_id: int | None = None,
+        name: str | None = None,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None) -> AsyncIterator[RespEntryHist]:
+    """Iterate a guild's history page by page, oldest first
+
+    Only one page is in memory at a time and no connection is held between pages.
+    See 'read_entry_hist_page' for the filters.
+    """
+    cursor = None
+    while True:
+        page = await read_entry_hist_page(guild_id, cursor, page_size, user_id, name, since, until)
+        if page is None:
+            raise RuntimeError("Failed to read history page for guild {}".format(guild_id))
+        for row in page.rows:
+            yield row
+        if page.cursor is None:
+            return
+        cursor = page.cursor
+
 async def read_all_entry_hist_for_guild(guild_id: int) -> list[RespEntryHist] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_all(
+                    db,
                     "SELECT name, won, guild_id, user_id, created_at FROM entry_hist WHERE guild_id=?",
-                    (guild_id,))
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntryHist(row[0], bool(row[1]), row[2], row[3], row[4]))
-                return result_list
+                    (guild_id,),
+                    _entry_hist_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_all_entry_hist_for_user_in_guild(guild_id: int, user_id: int) -> list[RespEntryHist] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_all(
+                    db,
                     "SELECT name, won, guild_id, user_id, created_at FROM entry_hist WHERE guild_id=? AND user_id=?",
-                    (guild_id, user_id,))
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespEntryHist(row[0], bool(row[1]), row[2], row[3], row[4]))
-                return result_list
+                    (guild_id, user_id,),
+                    _entry_hist_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def update_all_entry_hist_in_guild_by_name(guild_id: int, old_name: str, new_name: str) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("UPDATE entry_hist SET name=? WHERE guild_id=? AND name=?",
-                             (new_name, guild_id, old_name,))
+            await execute(db, "BEGIN IMMEDIATE")
+            await execute(db, "UPDATE entry_hist SET name=? WHERE guild_id=? AND name=?",
+                          (new_name, guild_id, old_name,))
+            # Renames can merge two entries so recount the guild
+            await statsdb.clear_stats(db, guild_id)
+            await statsdb.refresh_stats(db, guild_id)
             await db.commit()
             return True
         except Exception as e:
@@ -89,10 +224,10 @@ async def update_all_entry_hist_in_guild_by_name(guild_id: int, old_name: str, n
             return False
 
 async def delete_all_entry_hist() -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entry_hist")
+            await execute(db, "DELETE FROM entry_hist")
+            await statsdb.clear_stats(db, None)
             await db.commit()
             return True
         except Exception as e:
@@ -100,10 +235,10 @@ async def delete_all_entry_hist() -> bool:
             return False
 
 async def delete_all_entry_hist_for_guild(guild_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entry_hist WHERE guild_id=?", (guild_id,))
+            await execute(db, "DELETE FROM entry_hist WHERE guild_id=?", (guild_id,))
+            await statsdb.clear_stats(db, guild_id)
             await db.commit()
             return True
         except Exception as e:
@@ -111,10 +246,12 @@ async def delete_all_entry_hist_for_guild(guild_id: int) -> bool:
             return False
 
 async def delete_all_entry_hist_for_user_in_guild(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM entry_hist WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
+            await execute(db, "BEGIN IMMEDIATE")
+            await execute(db, "DELETE FROM entry_hist WHERE guild_id=? AND user_id=?", (guild_id, user_id,))
+            await statsdb.clear_stats(db, guild_id)
+            await statsdb.refresh_stats(db, guild_id)
             await db.commit()
             return True
         except Exception as e:
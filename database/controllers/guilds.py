@@ -1,26 +1,51 @@
 from collections import namedtuple
 
-import aiosqlite
-
+import database.controllers.entries as entriesdb
 from helpers.logger import logger
-from helpers.db import DATABASE_PATH
+from helpers.db import connection, record_factory, execute, fetch_all, fetch_one
 
 """
 Response Types
 """
 
 RespGuild = namedtuple('RespGuild', 'id channel_id autodraw_weekday autodraw_hour')
+_guild_row = record_factory(RespGuild)
+
+"""
+Cache
+"""
+
+# Process wide guild config cache, written through by the functions below and
+# authoritative once loaded with 'load_guild_cache'
+_cache: dict[int, RespGuild] = {}
+_cache_loaded = False
+
+async def load_guild_cache() -> bool:
+    """Fill the guild cache from the db"""
+    global _cache_loaded
+    guilds = await read_all_guilds()
+    if guilds is None:
+        return False
+    _cache.clear()
+    for guild in guilds:
+        _cache[guild.id] = guild
+    _cache_loaded = True
+    return True
+
+async def read_one_guild_cached(id: int) -> RespGuild | None:
+    """Read a guild from the cache, only going to the db if the cache isn't loaded"""
+    if _cache_loaded:
+        return _cache.get(id)
+    return await read_one_guild(id)
 
 """
 Functions
 """
 
 async def guild_exists(id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            cursor = await db.cursor()
-            await cursor.execute("SELECT 1 FROM guilds WHERE id=?", (id,))
-            return await cursor.fetchone() is not None
+            return await fetch_one(db, "SELECT 1 FROM guilds WHERE id=?", (id,)) is not None
         except Exception as e:
             logger.error(e)
             return False
@@ -30,42 +55,39 @@ async def create_one_guild(
         channel_id: int,
         autodraw_weekday: int,
         autodraw_hour: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute(
+            await execute(
+                    db,
                     "INSERT INTO guilds(id, channel_id, autodraw_weekday, autodraw_hour) VALUES (?, ?, ?, ?)",
                     (id, channel_id, autodraw_weekday, autodraw_hour,))
             await db.commit()
+            _cache[id] = RespGuild(id, channel_id, autodraw_weekday, autodraw_hour)
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def read_all_guilds() -> list[RespGuild] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT id, channel_id, autodraw_weekday, autodraw_hour FROM guilds")
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespGuild(row[0], row[1], row[2], row[3]))
-                return result_list
+            return await fetch_all(
+                    db,
+                    "SELECT id, channel_id, autodraw_weekday, autodraw_hour FROM guilds",
+                    (),
+                    _guild_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_one_guild(id: int) -> RespGuild | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute(
+            return await fetch_one(
+                    db,
                     "SELECT id, channel_id, autodraw_weekday, autodraw_hour FROM guilds WHERE id=?",
-                    (id,))
-            async with rows as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return RespGuild(row[0], row[1], row[2], row[3])
-                return None
+                    (id,),
+                    _guild_row)
         except Exception as e:
             logger.error(e)
             return None
@@ -75,7 +97,7 @@ async def update_one_guild(
         channel_id: int | None,
         autodraw_weekday: int | None,
         autodraw_hour: int | None) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
             sql = "UPDATE guilds SET "
             updates = []
@@ -93,30 +115,37 @@ async def update_one_guild(
             sql += " WHERE id=?"
             params.append(id)
 
-            await db.execute(sql, tuple(params))
+            await execute(db, sql, tuple(params))
             await db.commit()
+            if id in _cache:
+                _cache[id] = _cache[id]._replace(**{k: v for k, v in (
+                    ("channel_id", channel_id),
+                    ("autodraw_weekday", autodraw_weekday),
+                    ("autodraw_hour", autodraw_hour)) if v is not None})
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def delete_all_guilds() -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM guilds")
+            await execute(db, "DELETE FROM guilds")
             await db.commit()
+            _cache.clear()
+            entriesdb.invalidate_entry_pool()
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def delete_one_guild(id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM guilds WHERE id=?", (id,))
+            await execute(db, "DELETE FROM guilds WHERE id=?", (id,))
             await db.commit()
+            _cache.pop(id, None)
+            entriesdb.invalidate_entry_pool(id)
             return True
         except Exception as e:
             logger.error(e)
@@ -0,0 +1,194 @@
+import datetime
+from collections import namedtuple
+
+import aiosqlite
+
+from helpers.logger import logger
+from helpers.db import connection, record_factory, execute, fetch_all, from_epoch, to_epoch
+
+"""
+Response Types
+"""
+
+RespUserStats = namedtuple('RespUserStats', 'user_id picks wins last_win_at favorite favorite_count')
+RespEntryStats = namedtuple('RespEntryStats', 'name picks wins last_pick_at biggest_fan biggest_fan_count')
+_user_stats_row = record_factory(RespUserStats, (None, None, None, from_epoch, None, None))
+_entry_stats_row = record_factory(RespEntryStats, (None, None, None, from_epoch, None, None))
+
+"""
+Maintenance
+
+These run on a connection the caller already has a transaction open on so the stats
+are always updated together with entry_hist.
+"""
+
+# Folded from '{source}', a subquery over the history rows to count. Keeping the
+# filter in its own subquery lets SQLite seek the rowid range or the guild's index
+# instead of scanning every guild's history.
+_REFRESH_SQL = [
+    """INSERT INTO user_stats(guild_id, user_id, picks, wins, last_pick_at, last_win_at)
+    SELECT guild_id, user_id, COUNT(*), SUM(won), MAX(created_at), MAX(CASE WHEN won THEN created_at END)
+    FROM {source} GROUP BY guild_id, user_id
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET
+      picks = picks + excluded.picks,
+      wins = wins + excluded.wins,
+      last_pick_at = MAX(last_pick_at, excluded.last_pick_at),
+      last_win_at = COALESCE(MAX(last_win_at, excluded.last_win_at), last_win_at, excluded.last_win_at)""",
+    """INSERT INTO entry_stats(guild_id, name, picks, wins, last_pick_at, last_win_at)
+    SELECT guild_id, name, COUNT(*), SUM(won), MAX(created_at), MAX(CASE WHEN won THEN created_at END)
+    FROM {source} GROUP BY guild_id, name
+    ON CONFLICT(guild_id, name) DO UPDATE SET
+      picks = picks + excluded.picks,
+      wins = wins + excluded.wins,
+      last_pick_at = MAX(last_pick_at, excluded.last_pick_at),
+      last_win_at = COALESCE(MAX(last_win_at, excluded.last_win_at), last_win_at, excluded.last_win_at)""",
+    """INSERT INTO user_entry_stats(guild_id, user_id, name, picks, wins)
+    SELECT guild_id, user_id, name, COUNT(*), SUM(won)
+    FROM {source} GROUP BY guild_id, user_id, name
+    ON CONFLICT(guild_id, user_id, name) DO UPDATE SET
+      picks = picks + excluded.picks,
+      wins = wins + excluded.wins""",
+]
+
+# Params: (after_rowid,)
+_REFRESH_RANGE_SQL = [sql.format(source="""(
+      SELECT guild_id, user_id, name, won, created_at FROM entry_hist WHERE rowid > ? ORDER BY rowid)""")
+    for sql in _REFRESH_SQL]
+# Params: (guild_id, after_rowid)
+_REFRESH_GUILD_SQL = [sql.format(source="""(
+      SELECT guild_id, user_id, name, won, created_at FROM entry_hist WHERE guild_id = ? AND rowid > ?)""")
+    for sql in _REFRESH_SQL]
+
+_STATS_TABLES = ["user_stats", "entry_stats", "user_entry_stats"]
+
+async def refresh_stats(db: aiosqlite.Connection, guild_id: int | None, after_rowid: int = 0):
+    """Fold the entry_hist rows after a rowid into the stats (doesn't commit)
+
+    Args:
+        db: connection with an open transaction
+        guild_id: only fold this guild's rows, or None for all guilds
+        after_rowid: only fold rows with a greater rowid
+    """
+    if guild_id is None:
+        for sql in _REFRESH_RANGE_SQL:
+            await execute(db, sql, (after_rowid,))
+    else:
+        for sql in _REFRESH_GUILD_SQL:
+            await execute(db, sql, (guild_id, after_rowid,))
+
+async def clear_stats(db: aiosqlite.Connection, guild_id: int | None):
+    """Delete the stats (doesn't commit)
+
+    Args:
+        db: connection with an open transaction
+        guild_id: only clear this guild, or None for all guilds
+    """
+    for table in _STATS_TABLES:
+        if guild_id is None:
+            await execute(db, "DELETE FROM {}".format(table))
+        else:
+            await execute(db, "DELETE FROM {} WHERE guild_id=?".format(table), (guild_id,))
+
+# Same columns as the aggregate reads, grouped from a range of the history using the
+# (guild_id, created_at) index. Params: (guild_id, since)
+_USER_STATS_SINCE_SQL = """WITH h AS (
+      SELECT user_id, name, won, created_at FROM entry_hist WHERE guild_id=? AND created_at>=?
+    ), s AS (
+      SELECT user_id, COUNT(*) AS picks, SUM(won) AS wins, MAX(CASE WHEN won THEN created_at END) AS last_win_at
+      FROM h GROUP BY user_id
+    ), f AS (
+      SELECT user_id, name, picks, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY picks DESC, name) AS rank
+      FROM (SELECT user_id, name, COUNT(*) AS picks FROM h GROUP BY user_id, name)
+    )
+    SELECT s.user_id, s.picks, s.wins, s.last_win_at, f.name, f.picks
+    FROM s LEFT JOIN f ON f.user_id = s.user_id AND f.rank = 1
+    ORDER BY s.wins DESC, s.picks DESC"""
+
+_ENTRY_STATS_SINCE_SQL = """WITH h AS (
+      SELECT user_id, name, won, created_at FROM entry_hist WHERE guild_id=? AND created_at>=?
+    ), s AS (
+      SELECT name, COUNT(*) AS picks, SUM(won) AS wins, MAX(created_at) AS last_pick_at
+      FROM h GROUP BY name
+    ), f AS (
+      SELECT name, user_id, picks, ROW_NUMBER() OVER (PARTITION BY name ORDER BY picks DESC, user_id) AS rank
+      FROM (SELECT name, user_id, COUNT(*) AS picks FROM h GROUP BY name, user_id)
+    )
+    SELECT s.name, s.picks, s.wins, s.last_pick_at, f.user_id, f.picks
+    FROM s LEFT JOIN f ON f.name = s.name AND f.rank = 1
+    ORDER BY s.wins DESC, s.picks DESC"""
+
+"""
+Functions
+"""
+
+async def rebuild_stats(guild_id: int | None = None) -> bool:
+    async with connection() as db:
+        try:
+            await execute(db, "BEGIN IMMEDIATE")
+            await clear_stats(db, guild_id)
+            await refresh_stats(db, guild_id)
+            await db.commit()
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
+async def read_user_stats_for_guild(
+        guild_id: int,
+        since: datetime.datetime | None = None) -> list[RespUserStats] | None:
+    """Read the stats per user, all time from the aggregates or from the history since a time
+
+    Args:
+        guild_id: guild to read
+        since: only count draws at or after this time
+    """
+    async with connection() as db:
+        try:
+            if since is not None:
+                return await fetch_all(db, _USER_STATS_SINCE_SQL, (guild_id, to_epoch(since),), _user_stats_row)
+            return await fetch_all(
+                    db,
+                    """SELECT s.user_id, s.picks, s.wins, s.last_win_at, f.name, f.picks
+                    FROM user_stats s
+                    LEFT JOIN (
+                      SELECT user_id, name, picks, ROW_NUMBER() OVER (
+                        PARTITION BY user_id ORDER BY picks DESC, name) AS rank
+                      FROM user_entry_stats WHERE guild_id=?
+                    ) f ON f.user_id = s.user_id AND f.rank = 1
+                    WHERE s.guild_id=?
+                    ORDER BY s.wins DESC, s.picks DESC""",
+                    (guild_id, guild_id,),
+                    _user_stats_row)
+        except Exception as e:
+            logger.error(e)
+            return None
+
+async def read_entry_stats_for_guild(
+        guild_id: int,
+        since: datetime.datetime | None = None) -> list[RespEntryStats] | None:
+    """Read the stats per entry, all time from the aggregates or from the history since a time
+
+    Args:
+        guild_id: guild to read
+        since: only count draws at or after this time
+    """
+    async with connection() as db:
+        try:
+            if since is not None:
+                return await fetch_all(db, _ENTRY_STATS_SINCE_SQL, (guild_id, to_epoch(since),), _entry_stats_row)
+            return await fetch_all(
+                    db,
+                    """SELECT s.name, s.picks, s.wins, s.last_pick_at, f.user_id, f.picks
+                    FROM entry_stats s
+                    LEFT JOIN (
+                      SELECT name, user_id, picks, ROW_NUMBER() OVER (
+                        PARTITION BY name ORDER BY picks DESC, user_id) AS rank
+                      FROM user_entry_stats WHERE guild_id=?
+                    ) f ON f.name = s.name AND f.rank = 1
+                    WHERE s.guild_id=?
+                    ORDER BY s.wins DESC, s.picks DESC""",
+                    (guild_id, guild_id,),
+                    _entry_stats_row)
+        except Exception as e:
+            logger.error(e)
+            return None
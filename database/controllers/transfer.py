@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import time
+from collections import namedtuple
+
+import aiosqlite
+
+import database.controllers.entry_hist as entryhistdb
+import database.controllers.entries as entriesdb
+import database.controllers.stats as statsdb
+from helpers.logger import logger
+from helpers.db import connection, execute, executemany, fetch_all, stream, to_epoch
+
+"""
+Bulk export/import of guild data
+
+Exports are gzipped NDJSON. The first line is a header, then each table's rows
+follow a '{"table": ..., "columns": [...]}' line as one JSON array per row:
+
+    {"format": "aboulomania", "version": 1, "created_at": 1700000000}
+    {"table": "guilds", "columns": ["id", "channel_id", ...]}
+    [1234, 5678, 4, 17, 1690000000]
+    ...
+
+Importing a guild replaces all of that guild's data with the export's.
+"""
+
+"""
+Response Types
+"""
+
+RespTransfer = namedtuple('RespTransfer', 'guild_ids rows')
+
+FORMAT_NAME = "aboulomania"
+FORMAT_VERSION = 1
+IMPORT_BATCH_SIZE = 5000
+
+_TABLES = {
+    "guilds": ["id", "channel_id", "autodraw_weekday", "autodraw_hour", "created_at"],
+    "users": ["id", "created_at"],
+    "enrollments": ["guild_id", "user_id", "created_at"],
+    "entries": ["name", "first", "guild_id", "user_id", "created_at"],
+    "entry_hist": ["name", "won", "guild_id", "user_id", "created_at"],
+}
+
+# Users are shared between guilds so they're only ever added
+_INSERT_SQL = {
+    table: "INSERT OR {} INTO {}({}) VALUES ({})".format(
+        "IGNORE" if table == "users" else "ABORT", table, ", ".join(columns), ", ".join("?" * len(columns)))
+    for table, columns in _TABLES.items()
+}
+
+_EXPORT_SQL = {
+    "guilds": "SELECT id, channel_id, autodraw_weekday, autodraw_hour, created_at FROM guilds WHERE id=?",
+    "users": """SELECT id, created_at FROM users WHERE id IN (
+        SELECT user_id FROM enrollments WHERE guild_id=?1
+        UNION SELECT user_id FROM entries WHERE guild_id=?1
+        UNION SELECT user_id FROM entry_hist WHERE guild_id=?1)""",
+    "enrollments": "SELECT guild_id, user_id, created_at FROM enrollments WHERE guild_id=?",
+    "entries": "SELECT name, first, guild_id, user_id, created_at FROM entries WHERE guild_id=?",
+}
+
+"""
+Helpers
+"""
+
+class _Writer:
+    """Buffer export lines and write them from a worker thread"""
+
+    def __init__(self, file):
+        self.file = file
+        self.lines = []
+        self.rows = 0
+
+    def header(self, table: str):
+        self.lines.append(json.dumps({"table": table, "columns": _TABLES[table]}))
+
+    async def row(self, row):
+        self.lines.append(json.dumps(list(row), separators=(",", ":")))
+        self.rows += 1
+        if len(self.lines) >= IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if self.lines:
+            data = "\n".join(self.lines) + "\n"
+            self.lines = []
+            await asyncio.to_thread(self.file.write, data)
+
+async def _read_lines(file) -> list[str]:
+    return await asyncio.to_thread(file.readlines, 1 << 20)
+
+async def _flush_rows(db: aiosqlite.Connection, table: str | None, rows: list) -> int:
+    if table is None or not rows:
+        return 0
+    await executemany(db, _INSERT_SQL[table], rows)
+    count = len(rows)
+    rows.clear()
+    return count
+
+"""
+Functions
+"""
+
+async def read_all_guild_ids() -> list[int] | None:
+    async with connection() as db:
+        try:
+            return [row[0] for row in await fetch_all(db, "SELECT id FROM guilds ORDER BY id", ())]
+        except Exception as e:
+            logger.error(e)
+            return None
+
+async def export_guilds(path: str, guild_ids: list[int] | None = None) -> RespTransfer | None:
+    """Stream guilds' data to a gzipped NDJSON export
+
+    Args:
+        path: file to write
+        guild_ids: guilds to export, or None for all guilds
+    """
+    try:
+        if guild_ids is None:
+            guild_ids = await read_all_guild_ids()
+            if guild_ids is None:
+                return None
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            writer = _Writer(file)
+            writer.lines.append(json.dumps(
+                {"format": FORMAT_NAME, "version": FORMAT_VERSION, "created_at": int(time.time())}))
+            for guild_id in guild_ids:
+                for table, sql in _EXPORT_SQL.items():
+                    writer.header(table)
+                    async for row in stream(sql, (guild_id,), lambda c, r: r):
+                        await writer.row(row)
+                # History is read a page at a time
+                writer.header("entry_hist")
+                async for e in entryhistdb.iter_entry_hist(guild_id):
+                    await writer.row((e.name, e.won and 1 or 0, e.guild_id, e.user_id, to_epoch(e.created_at)))
+            await writer.flush()
+        return RespTransfer(guild_ids, writer.rows)
+    except Exception as e:
+        logger.error(e)
+        return None
+
+async def import_guilds(path: str) -> RespTransfer | None:
+    """Bulk load an export, replacing the exported guilds' data, in one transaction
+
+    Args:
+        path: file to read
+    """
+    async with connection() as db:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                lines = await _read_lines(file)
+                header = json.loads(lines[0]) if lines else {}
+                if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+                    raise ValueError("'{}' is not a supported export".format(path))
+                lines = lines[1:]
+
+                await execute(db, "BEGIN IMMEDIATE")
+                # Rows only need to be consistent once everything is loaded
+                await execute(db, "PRAGMA defer_foreign_keys = ON")
+                guild_ids = []
+                table = None
+                rows = []
+                count = 0
+                while lines:
+                    for line in lines:
+                        value = json.loads(line)
+                        if isinstance(value, dict):
+                            count += await _flush_rows(db, table, rows)
+                            table = value["table"]
+                            if table not in _TABLES or value["columns"] != _TABLES[table]:
+                                raise ValueError("Unsupported table '{}' in export".format(table))
+                            continue
+                        if table == "guilds":
+                            # Replace the guild, cascading to all its data
+                            await execute(db, "DELETE FROM guilds WHERE id=?", (value[0],))
+                            guild_ids.append(value[0])
+                        rows.append(value)
+                        if len(rows) >= IMPORT_BATCH_SIZE:
+                            count += await _flush_rows(db, table, rows)
+                    lines = await _read_lines(file)
+                count += await _flush_rows(db, table, rows)
+
+                for guild_id in guild_ids:
+                    await statsdb.clear_stats(db, guild_id)
+                    await statsdb.refresh_stats(db, guild_id)
+                await db.commit()
+                for guild_id in guild_ids:
+                    entriesdb.invalidate_entry_pool(guild_id)
+                return RespTransfer(guild_ids, count)
+        except Exception as e:
+            logger.error(e)
+            return None
@@ -1,34 +1,32 @@
 from collections import namedtuple
 
-import aiosqlite
-
+import database.controllers.entries as entriesdb
 from helpers.logger import logger
-from helpers.db import DATABASE_PATH
+from helpers.db import connection, record_factory, execute, fetch_all, fetch_one
 
 """
 Response Types
 """
 
 RespUser = namedtuple('RespUser', 'id')
+_user_row = record_factory(RespUser)
 
 """
 Functions
 """
 
 async def user_exists(id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            cursor = await db.cursor()
-            await cursor.execute("SELECT 1 FROM users WHERE id=?", (id,))
-            return await cursor.fetchone() is not None
+            return await fetch_one(db, "SELECT 1 FROM users WHERE id=?", (id,)) is not None
         except Exception as e:
             logger.error(e)
             return False
 
 async def create_one_user(id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("INSERT INTO users(id) VALUES (?)", (id,))
+            await execute(db, "INSERT INTO users(id) VALUES (?)", (id,))
             await db.commit()
             return True
         except Exception as e:
@@ -36,49 +34,46 @@ async def create_one_user(id: int) -> bool:
             return False
 
 async def read_all_users() -> list[RespUser] | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT id FROM users")
-            async with rows as cursor:
-                result = await cursor.fetchall()
-                result_list = []
-                for row in result:
-                    result_list.append(RespUser(row[0]))
-                return result_list
+            return await fetch_all(
+                    db,
+                    "SELECT id FROM users",
+                    (),
+                    _user_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def read_one_user(id: int) -> RespUser | None:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            rows = await db.execute("SELECT id FROM users WHERE id=?", (id,))
-            async with rows as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return RespUser(row[0])
-                return None
+            return await fetch_one(
+                    db,
+                    "SELECT id FROM users WHERE id=?",
+                    (id,),
+                    _user_row)
         except Exception as e:
             logger.error(e)
             return None
 
 async def delete_all_users() -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM users")
+            await execute(db, "DELETE FROM users")
             await db.commit()
+            entriesdb.invalidate_entry_pool()
             return True
         except Exception as e:
             logger.error(e)
             return False
 
 async def delete_one_user(id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with connection() as db:
         try:
-            await db.execute("PRAGMA foreign_keys = ON")
-            await db.execute("DELETE FROM users WHERE id=?", (id,))
+            await execute(db, "DELETE FROM users WHERE id=?", (id,))
             await db.commit()
+            entriesdb.invalidate_entry_pool()
             return True
         except Exception as e:
             logger.error(e)
@@ -0,0 +1,12 @@
+-- Indexes for the controllers' lookups by guild and by guild & user
+
+CREATE INDEX IF NOT EXISTS `idx_enrollments_user` ON `enrollments` (`user_id`);
+
+-- Covers all the entries reads (guild or guild & user) without touching the table
+CREATE INDEX IF NOT EXISTS `idx_entries_guild_user` ON `entries` (`guild_id`, `user_id`, `name`, `first`);
+
+-- Covers the history reads (guild or guild & user) used by the stats commands
+CREATE INDEX IF NOT EXISTS `idx_entry_hist_guild_user` ON `entry_hist` (`guild_id`, `user_id`, `name`, `won`, `created_at`);
+
+-- Renames and per entry lookups
+CREATE INDEX IF NOT EXISTS `idx_entry_hist_guild_name` ON `entry_hist` (`guild_id`, `name`);
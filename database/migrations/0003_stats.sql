@@ -0,0 +1,51 @@
+-- Per guild aggregates of entry_hist, kept up to date by the entry_hist controller
+
+CREATE TABLE IF NOT EXISTS `user_stats` (
+  `guild_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `picks` int NOT NULL DEFAULT 0,
+  `wins` int NOT NULL DEFAULT 0,
+  `last_pick_at` timestamp,
+  `last_win_at` timestamp,
+  PRIMARY KEY(guild_id, user_id),
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS `entry_stats` (
+  `guild_id` int NOT NULL,
+  `name` varchar(50) NOT NULL,
+  `picks` int NOT NULL DEFAULT 0,
+  `wins` int NOT NULL DEFAULT 0,
+  `last_pick_at` timestamp,
+  `last_win_at` timestamp,
+  PRIMARY KEY(guild_id, name),
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE
+);
+
+-- How often each user picked each entry (favorites and biggest fans)
+CREATE TABLE IF NOT EXISTS `user_entry_stats` (
+  `guild_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `name` varchar(50) NOT NULL,
+  `picks` int NOT NULL DEFAULT 0,
+  `wins` int NOT NULL DEFAULT 0,
+  PRIMARY KEY(guild_id, user_id, name),
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS `idx_user_entry_stats_guild_name` ON `user_entry_stats` (`guild_id`, `name`, `picks`);
+
+-- Backfill from the existing history
+INSERT INTO user_stats(guild_id, user_id, picks, wins, last_pick_at, last_win_at)
+  SELECT guild_id, user_id, COUNT(*), SUM(won), MAX(created_at), MAX(CASE WHEN won THEN created_at END)
+  FROM entry_hist GROUP BY guild_id, user_id;
+
+INSERT INTO entry_stats(guild_id, name, picks, wins, last_pick_at, last_win_at)
+  SELECT guild_id, name, COUNT(*), SUM(won), MAX(created_at), MAX(CASE WHEN won THEN created_at END)
+  FROM entry_hist GROUP BY guild_id, name;
+
+INSERT INTO user_entry_stats(guild_id, user_id, name, picks, wins)
+  SELECT guild_id, user_id, name, COUNT(*), SUM(won)
+  FROM entry_hist GROUP BY guild_id, user_id, name;
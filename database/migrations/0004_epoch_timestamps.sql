@@ -0,0 +1,70 @@
+-- Store timestamps as integer epoch seconds (UTC) instead of 'YYYY-MM-DD HH:MM:SS' text
+-- The tables are rebuilt to change their defaults (foreign keys are off while migrating)
+
+CREATE TABLE `guilds_new` (
+  `id` int NOT NULL PRIMARY KEY, -- discord guild_id
+  `channel_id` int NOT NULL, -- discord channel_id
+  `autodraw_weekday` int NOT NULL,
+  `autodraw_hour` int NOT NULL,
+  `created_at` int NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS int))
+);
+INSERT INTO guilds_new SELECT id, channel_id, autodraw_weekday, autodraw_hour, CAST(strftime('%s', created_at) AS int) FROM guilds;
+DROP TABLE guilds;
+ALTER TABLE guilds_new RENAME TO guilds;
+
+CREATE TABLE `users_new` (
+  `id` int NOT NULL PRIMARY KEY, -- discord user_id
+  `created_at` int NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS int))
+);
+INSERT INTO users_new SELECT id, CAST(strftime('%s', created_at) AS int) FROM users;
+DROP TABLE users;
+ALTER TABLE users_new RENAME TO users;
+
+CREATE TABLE `enrollments_new` ( -- Many-to-many junction table for guilds & users
+  `guild_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `created_at` int NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS int)),
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  CONSTRAINT guilds_users UNIQUE(guild_id, user_id)
+);
+INSERT INTO enrollments_new SELECT guild_id, user_id, CAST(strftime('%s', created_at) AS int) FROM enrollments;
+DROP TABLE enrollments;
+ALTER TABLE enrollments_new RENAME TO enrollments;
+CREATE INDEX IF NOT EXISTS `idx_enrollments_user` ON `enrollments` (`user_id`);
+
+CREATE TABLE `entries_new` (
+  `name` varchar(50) NOT NULL,
+  `first` int NOT NULL DEFAULT 0, -- boolean, if first choice
+  `guild_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `created_at` int NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS int)),
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+INSERT INTO entries_new SELECT name, first, guild_id, user_id, CAST(strftime('%s', created_at) AS int) FROM entries;
+DROP TABLE entries;
+ALTER TABLE entries_new RENAME TO entries;
+CREATE INDEX IF NOT EXISTS `idx_entries_guild_user` ON `entries` (`guild_id`, `user_id`, `name`, `first`);
+
+CREATE TABLE `entry_hist_new` (
+  `name` varchar(50) NOT NULL,
+  `won` int NOT NULL DEFAULT 0, -- boolean, if entry won
+  `guild_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `created_at` int NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS int)), -- the day the entry was drawn
+  FOREIGN KEY(guild_id) REFERENCES guilds(id) ON DELETE CASCADE,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+INSERT INTO entry_hist_new SELECT name, won, guild_id, user_id, CAST(strftime('%s', created_at) AS int) FROM entry_hist;
+DROP TABLE entry_hist;
+ALTER TABLE entry_hist_new RENAME TO entry_hist;
+CREATE INDEX IF NOT EXISTS `idx_entry_hist_guild_user` ON `entry_hist` (`guild_id`, `user_id`, `name`, `won`, `created_at`);
+CREATE INDEX IF NOT EXISTS `idx_entry_hist_guild_name` ON `entry_hist` (`guild_id`, `name`);
+
+UPDATE user_stats SET
+  last_pick_at = CAST(strftime('%s', last_pick_at) AS int),
+  last_win_at = CAST(strftime('%s', last_win_at) AS int);
+UPDATE entry_stats SET
+  last_pick_at = CAST(strftime('%s', last_pick_at) AS int),
+  last_win_at = CAST(strftime('%s', last_win_at) AS int);
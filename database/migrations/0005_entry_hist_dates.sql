@@ -0,0 +1,3 @@
+-- Date range reads and keyset pagination of a guild's history ordered by (created_at, rowid)
+
+CREATE INDEX IF NOT EXISTS `idx_entry_hist_guild_created` ON `entry_hist` (`guild_id`, `created_at`);
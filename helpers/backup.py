@@ -0,0 +1,103 @@
+import asyncio
+import datetime
+import os
+import sqlite3
+from collections import namedtuple
+
+from helpers.logger import logger
+
+"""
+Response Types
+"""
+
+BackupProgress = namedtuple('BackupProgress', 'running pages_total pages_remaining last_path last_at')
+
+BACKUP_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/backups"
+PAGES_PER_STEP = 256
+STEP_SLEEP_SECONDS = 0.005
+
+class BackupManager:
+    """Online backups of the live db using SQLite's incremental backup API
+
+    The copy runs in a worker thread a few pages at a time with a short sleep between
+    steps, so the event loop never waits on it and the db is only read locked for one
+    step at a time. The newest 'keep' snapshots are kept.
+    """
+
+    def __init__(self, db_path: str, keep: int, backup_path: str = BACKUP_PATH):
+        self.db_path = db_path
+        self.keep = max(1, keep)
+        self.backup_path = backup_path
+        self.pages_total = 0
+        self.pages_remaining = 0
+        self.last_path = None
+        self.last_at = None
+        self._task: asyncio.Task | None = None
+
+    def progress(self) -> BackupProgress:
+        """Get the current/last backup progress"""
+        return BackupProgress(
+                self.running(), self.pages_total, self.pages_remaining, self.last_path, self.last_at)
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run(self) -> str | None:
+        """Take a snapshot, or wait for the one already running
+
+        Returns:
+            the snapshot path or None if it failed
+        """
+        if not self.running():
+            self._task = asyncio.create_task(self._run())
+        return await asyncio.shield(self._task)
+
+    async def schedule(self, interval: datetime.timedelta):
+        """Take a snapshot every interval, forever
+
+        Args:
+            interval: time between snapshots
+        """
+        while True:
+            await asyncio.sleep(interval.total_seconds())
+            await self.run()
+
+    async def _run(self) -> str | None:
+        os.makedirs(self.backup_path, exist_ok=True)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        path = os.path.join(self.backup_path, "database-{}.db".format(now.strftime("%Y%m%d-%H%M%S")))
+        try:
+            logger.info("Starting db backup to '{}'".format(path))
+            await asyncio.to_thread(self._backup, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self.last_path = path
+            self.last_at = now
+            self._rotate()
+            logger.info("Finished db backup to '{}'".format(path))
+            return path
+        except Exception as e:
+            logger.error("Db backup failed: {}".format(e))
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            return None
+
+    def _backup(self, path: str):
+        """Copy the db a step at a time (runs in a worker thread)"""
+        def progress(status, remaining, total):
+            self.pages_remaining = remaining
+            self.pages_total = total
+
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP_SECONDS)
+        finally:
+            target.close()
+            source.close()
+
+    def _rotate(self):
+        """Delete all but the newest snapshots"""
+        snapshots = sorted(
+                f for f in os.listdir(self.backup_path) if f.startswith("database-") and f.endswith(".db"))
+        for f in snapshots[:-self.keep]:
+            os.remove(os.path.join(self.backup_path, f))
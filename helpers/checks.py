@@ -1,11 +1,11 @@
 from typing import Callable, TypeVar
 
-import discord
 from discord.ext import commands
 
 import database.controllers.guilds as guildsdb
 from exceptions import *
 from helpers.config import config as app_config
+from helpers.metrics import timed
 
 T = TypeVar("T")
 
@@ -17,14 +17,12 @@ def in_channel() -> Callable[[T], T]:
     """
     async def predicate(ctx: commands.Context) -> bool:
         if ctx.guild:
-            entry = await guildsdb.read_one_guild(ctx.guild.id)
-            if entry:
-                channel = discord.utils.get(ctx.guild.text_channels, id=entry.channel_id)
-                if channel and channel.id == ctx.channel.id:
-                    return True
+            entry = await guildsdb.read_one_guild_cached(ctx.guild.id)
+            if entry and entry.channel_id == ctx.channel.id:
+                return True
         raise NotInChannel
 
-    return commands.check(predicate)
+    return commands.check(timed("checks")(predicate))
 
 def in_guild() -> Callable[[T], T]:
     """Checks to see if request is comming from a guild channel an not DMs
@@ -37,7 +35,7 @@ def in_guild() -> Callable[[T], T]:
             raise NotInGuild
         return True
 
-    return commands.check(predicate)
+    return commands.check(timed("checks")(predicate))
 
 def is_owner() -> Callable[[T], T]:
     """Checks to see if user is an owner
@@ -50,7 +48,7 @@ def is_owner() -> Callable[[T], T]:
             raise UserNotOwner
         return True
 
-    return commands.check(predicate)
+    return commands.check(timed("checks")(predicate))
 
 def is_admin() -> Callable[[T], T]:
     """Checks to see if user is an administrator
@@ -63,4 +61,4 @@ def is_admin() -> Callable[[T], T]:
             raise UserNotAdmin
         return True
 
-    return commands.check(predicate)
+    return commands.check(timed("checks")(predicate))
@@ -47,3 +47,15 @@ else:
         set_default(config, "prefix", str, "!")
         set_default(config, "timezone", str, "Canada/Saskatchewan")
         set_default(config, "owners", list, [])
+        set_default(config, "db_pool_size", int, 4)
+        set_default(config, "db_pragmas", dict, {})
+        set_default(config, "db_slow_query_ms", int, 100)
+        set_default(config, "draw_max_concurrency", int, 4)
+        set_default(config, "autodraw_jitter", int, 0)
+        set_default(config, "backup_interval_hours", int, 24)
+        set_default(config, "backup_keep", int, 7)
+        set_default(config, "entry_group_commit_ms", int, 0)
+        set_default(config, "entry_group_commit_max_ops", int, 100)
+        set_default(config, "embed_cache_max_kb", int, 4096)
+        set_default(config, "metrics_port", int, -1)
+        set_default(config, "metrics_host", str, "127.0.0.1")
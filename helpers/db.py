@@ -1,13 +1,355 @@
+import asyncio
+import datetime
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable, Sequence
 
 import aiosqlite
 
+from helpers.logger import logger
+from helpers.metrics import phase
+from helpers.query_stats import query_tracker
+
 
 DATABASE_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/database.db"
+MIGRATIONS_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/migrations"
+POOL_SIZE_DEFAULT = 4
+STREAM_BATCH_SIZE = 500
+# Tuned so readers never block behind writers and commits don't fsync the whole db
+PRAGMAS_DEFAULT = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000, # KiB when negative
+    "mmap_size": 134217728,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000, # ms
+}
+
+async def apply_pragmas(conn: aiosqlite.Connection, pragmas: dict):
+    """Apply a PRAGMA profile to a connection
+
+    Args:
+        conn: connection to apply to
+        pragmas: pragma name -> value
+    """
+    for name, value in pragmas.items():
+        await conn.execute("PRAGMA {}={}".format(name, value))
+
+def from_epoch(value: int | None) -> datetime.datetime | None:
+    """Convert an epoch seconds db timestamp to an aware UTC datetime
+
+    Args:
+        value: epoch seconds or None
+    """
+    if value is None:
+        return None
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+
+"""
+Row mapping
+"""
+
+RowFactory = Callable[[Any, tuple], Any]
+
+def record_factory(record_type: type, converters: Sequence[Callable | None] | None = None) -> RowFactory:
+    """Build a row factory that decodes rows straight into a record type
+
+    Used as the cursor row factory so rows aren't fetched as plain tuples first and
+    copied into records afterwards. Records are namedtuples which are already
+    compact (no per instance dict).
+
+    Args:
+        record_type: namedtuple type to build
+        converters: per column conversion (or None to keep the value)
+
+    Returns:
+        the row factory
+    """
+    make = record_type._make
+    if not converters or not any(converters):
+        return lambda cursor, row: make(row)
+    columns = list(enumerate(converters))
+    def factory(cursor, row):
+        return make([convert(row[i]) if convert else row[i] for i, convert in columns])
+    return factory
+
+async def execute(db: aiosqlite.Connection, sql: str, params: Sequence = ()) -> int:
+    """Run a statement
+
+    Args:
+        db: connection to use
+        sql: statement
+        params: statement parameters
+
+    Returns:
+        rows changed
+    """
+    start = time.perf_counter()
+    cursor = await db.execute(sql, params)
+    try:
+        rows = max(cursor.rowcount, 0)
+    finally:
+        await cursor.close()
+    await query_tracker.observe(db, sql, params, time.perf_counter() - start, rows)
+    return rows
+
+async def executemany(db: aiosqlite.Connection, sql: str, params: Iterable[Sequence]) -> int:
+    """Run a statement once per parameter row
+
+    Args:
+        db: connection to use
+        sql: statement
+        params: parameter rows
+
+    Returns:
+        rows changed
+    """
+    start = time.perf_counter()
+    cursor = await db.executemany(sql, params)
+    try:
+        rows = max(cursor.rowcount, 0)
+    finally:
+        await cursor.close()
+    await query_tracker.observe(db, sql, None, time.perf_counter() - start, rows)
+    return rows
+
+async def fetch_all(db: aiosqlite.Connection, sql: str, params: Sequence, factory: RowFactory | None = None) -> list:
+    """Run a query and decode all the rows with a row factory
+
+    Args:
+        db: connection to use
+        sql: query
+        params: query parameters
+        factory: row factory from 'record_factory', or None for plain tuples
+    """
+    start = time.perf_counter()
+    cursor = await db.cursor()
+    try:
+        cursor.row_factory = factory
+        await cursor.execute(sql, params)
+        rows = await cursor.fetchall()
+    finally:
+        await cursor.close()
+    await query_tracker.observe(db, sql, params, time.perf_counter() - start, len(rows))
+    return rows
+
+async def fetch_one(db: aiosqlite.Connection, sql: str, params: Sequence, factory: RowFactory | None = None) -> Any | None:
+    """Run a query and decode the first row with a row factory
+
+    Args:
+        db: connection to use
+        sql: query
+        params: query parameters
+        factory: row factory from 'record_factory', or None for a plain tuple
+    """
+    start = time.perf_counter()
+    cursor = await db.cursor()
+    try:
+        cursor.row_factory = factory
+        await cursor.execute(sql, params)
+        row = await cursor.fetchone()
+    finally:
+        await cursor.close()
+    await query_tracker.observe(db, sql, params, time.perf_counter() - start, int(row is not None))
+    return row
+
+async def stream(sql: str, params: Sequence, factory: RowFactory, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator:
+    """Run a query and yield the decoded rows a batch at a time
+
+    Holds a pooled connection until the iteration finishes or the generator is
+    closed, so close it (e.g. 'contextlib.aclosing') when stopping early. Only the
+    time spent in the db counts towards the query stats, not the caller's.
+
+    Args:
+        sql: query
+        params: query parameters
+        factory: row factory from 'record_factory'
+        batch_size: rows fetched per batch
+    """
+    async with connection() as db:
+        elapsed = 0.0
+        count = 0
+        cursor = await db.cursor()
+        try:
+            cursor.row_factory = factory
+            start = time.perf_counter()
+            await cursor.execute(sql, params)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                count += len(rows)
+                for row in rows:
+                    yield row
+                start = time.perf_counter()
+        finally:
+            await cursor.close()
+            query_tracker.record(sql, elapsed, count)
+
+def to_epoch(value: datetime.datetime) -> int:
+    """Convert a datetime to an epoch seconds db timestamp (naive means UTC)
+
+    Args:
+        value: datetime to convert
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp())
+
+async def migrate(conn: aiosqlite.Connection) -> int:
+    """Apply all migrations newer than the db's schema version
+
+    Migrations are the numbered '<version>_<name>.sql' files in MIGRATIONS_PATH and
+    each one is applied in its own transaction together with its version bump.
+
+    Args:
+        conn: connection to migrate
+
+    Returns:
+        the schema version after migrating
+    """
+    # Migrations may rebuild tables which foreign keys would cascade into
+    await conn.execute("PRAGMA foreign_keys = OFF")
+    await conn.execute(
+            "CREATE TABLE IF NOT EXISTS `schema_version` ("
+            "`version` int NOT NULL PRIMARY KEY, "
+            "`applied_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+    await conn.commit()
+    async with conn.execute("SELECT MAX(version) FROM schema_version") as cursor:
+        row = await cursor.fetchone()
+        version = row[0] if row and row[0] is not None else 0
+
+    migrations = []
+    for file in os.listdir(MIGRATIONS_PATH):
+        if file.endswith(".sql"):
+            migrations.append((int(file.split("_")[0]), file))
+    for file_version, file in sorted(migrations):
+        if file_version <= version:
+            continue
+        with open(os.path.join(MIGRATIONS_PATH, file)) as f:
+            script = f.read()
+        logger.info("Applying db migration '{}'".format(file))
+        try:
+            await conn.executescript(
+                    "BEGIN;\n{}\nINSERT INTO schema_version(version) VALUES ({});\nCOMMIT;".format(
+                        script, file_version))
+        except Exception:
+            if conn.in_transaction:
+                await conn.rollback()
+            raise
+        version = file_version
+    return version
+
+class ConnectionPool:
+    """Fixed size pool of long-lived aiosqlite connections
+
+    Each connection is opened once (one background thread and file handle) and
+    handed out to the controllers on demand instead of opening a new one per query.
+    """
+
+    def __init__(self, path: str, size: int, pragmas: dict):
+        self.path = path
+        self.size = max(1, size)
+        self.pragmas = pragmas
+        self._connections: list[aiosqlite.Connection] = []
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+
+    async def setup_connection(self, conn: aiosqlite.Connection):
+        """Per connection setup run once when the connection is opened
+
+        Args:
+            conn: connection to setup
+        """
+        await conn.execute("PRAGMA foreign_keys = ON")
+        await apply_pragmas(conn, self.pragmas)
+
+    async def open(self):
+        """Open all the connections in the pool"""
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.path)
+            await self.setup_connection(conn)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+        logger.info("Opened database pool with {} connections".format(self.size))
+
+    async def close(self):
+        """Close all the connections in the pool"""
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.error(e)
+        self._connections.clear()
+        self._idle = asyncio.Queue()
+        logger.info("Closed database pool")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection from the pool, waiting if all are in use
+
+        Yields:
+            the connection, which is returned to the pool on exit
+        """
+        with phase("db"):
+            waiting_since = time.perf_counter()
+            conn = await self._idle.get()
+            query_tracker.record_wait(time.perf_counter() - waiting_since)
+            try:
+                yield conn
+            finally:
+                # Never hand out a connection with a half finished transaction
+                if conn.in_transaction:
+                    try:
+                        await conn.rollback()
+                    except Exception as e:
+                        logger.error(e)
+                self._idle.put_nowait(conn)
+
+pool: ConnectionPool | None = None
+
+def connection():
+    """Borrow a connection from the shared pool
+
+    Returns:
+        async context manager yielding the connection
+    """
+    if pool is None:
+        raise RuntimeError("Database pool used before 'init_db' was called")
+    return pool.acquire()
+
+async def init_db(
+        path: str = DATABASE_PATH,
+        pool_size: int = POOL_SIZE_DEFAULT,
+        pragmas: dict | None = None,
+        slow_query_ms: int = -1):
+    """Migrate the schema and open the shared connection pool
+
+    Args:
+        path: database file path
+        pool_size: number of connections to keep open
+        pragmas: overrides for PRAGMAS_DEFAULT
+        slow_query_ms: log statements taking at least this long, or -1 to disable
+    """
+    global pool
+    query_tracker.slow_threshold = slow_query_ms / 1000 if slow_query_ms >= 0 else None
+    pragmas = {**PRAGMAS_DEFAULT, **(pragmas or {})}
+    for name, value in list(pragmas.items()):
+        # Pragmas can't be bound as parameters so only allow plain names and values
+        if not name.isidentifier() or not (isinstance(value, int) or str(value).isalnum()):
+            logger.error("Ignoring invalid pragma '{}={}'".format(name, value))
+            del pragmas[name]
+    async with aiosqlite.connect(path) as db:
+        await apply_pragmas(db, pragmas)
+        version = await migrate(db)
+        logger.info("Database schema at version {}".format(version))
+    pool = ConnectionPool(path, pool_size, pragmas)
+    await pool.open()
 
-async def init_db():
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Load schema
-        with open(f"{os.path.realpath(os.path.dirname(__file__))}/../database/schema.sql") as file:
-            await db.executescript(file.read())
-        await db.commit()
+async def close_db():
+    """Close the shared connection pool"""
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
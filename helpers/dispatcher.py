@@ -0,0 +1,278 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from collections import namedtuple
+
+import discord
+
+from helpers.logger import logger
+from helpers.metrics import phase
+
+"""
+Outbound message dispatcher
+
+All messages go through one dispatcher instead of each command sending directly and
+waiting out 429s. Each route (channel) keeps its own queue, by priority then in
+order, paced by its token bucket. A route only joins the shared ready queue once it
+has a token, ordered by its next message's priority, so a busy channel waits on its
+own limit without holding up the others, and when a busy autodraw slot fires across
+many guilds the draw results go out first. Identical sends to a route that are
+still queued are only sent once.
+
+Interaction responses (slash commands) have to be sent within a few seconds and
+don't share the channel's limits, so they're sent straight away.
+"""
+
+"""
+Response Types
+"""
+
+DispatcherStats = namedtuple('DispatcherStats', 'queued queued_by_priority sent coalesced failed avg_wait max_wait')
+
+# Lower goes first
+PRIORITY_DRAW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Discord allows ~50 requests per second globally and ~5 messages per 5 seconds per channel
+GLOBAL_RATE = 50.0
+GLOBAL_BURST = 50
+ROUTE_RATE = 1.0
+ROUTE_BURST = 5
+WORKERS = 16
+# Idle routes are full again, so they're dropped once there are this many
+MAX_IDLE_ROUTES = 1000
+
+class TokenBucket:
+    """Allow 'capacity' calls at once, refilled at 'rate' per second"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        """Take a token, going into debt if there isn't one"""
+        self._refill()
+        self.tokens -= 1
+
+    async def acquire(self):
+        """Wait for a token and take it"""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class _Route:
+    __slots__ = ("bucket", "items", "scheduled", "timer")
+
+    def __init__(self):
+        self.bucket = TokenBucket(ROUTE_RATE, ROUTE_BURST)
+        # (priority, seq, item) heap of the route's queued sends
+        self.items: list = []
+        # Waiting for a token, on the ready queue or being sent. Only one send per
+        # route is in flight so its messages keep their order
+        self.scheduled = False
+        self.timer: asyncio.TimerHandle | None = None
+
+    def idle(self) -> bool:
+        return not self.items and not self.scheduled and self.bucket.full()
+
+class _Send:
+    __slots__ = ("target", "route_id", "kwargs", "key", "priority", "futures", "queued_at")
+
+    def __init__(self, target, route_id, kwargs: dict, key, priority: int):
+        self.target = target
+        self.route_id = route_id
+        self.kwargs = kwargs
+        self.key = key
+        self.priority = priority
+        self.futures: list[asyncio.Future] = []
+        self.queued_at = time.monotonic()
+
+def _route_id(target: discord.abc.Messageable):
+    channel = getattr(target, "channel", None)
+    if channel is not None:
+        return channel.id
+    return getattr(target, "id", None)
+
+def _coalesce_key(route_id, kwargs: dict):
+    """Key identifying a plain content/embed send, or None if it can't be coalesced"""
+    if not kwargs.keys() <= {"content", "embed", "embeds"}:
+        return None
+    embeds = list(kwargs.get("embeds") or []) + ([kwargs["embed"]] if kwargs.get("embed") else [])
+    return (route_id, kwargs.get("content"),
+            tuple(json.dumps(embed.to_dict(), sort_keys=True) for embed in embeds))
+
+class Dispatcher:
+    """Send messages by priority, paced by per-route and global token buckets"""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # (priority, seq, route) of routes with a token and something to send
+        self._ready: asyncio.PriorityQueue | None = None
+        self._queued_by_priority: dict[int, int] = {}
+        self._pending: dict = {}
+        self._routes: dict = {}
+        self._global = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._seq = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._ready = asyncio.PriorityQueue()
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Anything still queued won't be sent
+        for route in self._routes.values():
+            if route.timer is not None:
+                route.timer.cancel()
+            for _, _, item in route.items:
+                for future in item.futures:
+                    if not future.done():
+                        future.cancel()
+        self._routes.clear()
+        self._pending.clear()
+        self._queued_by_priority.clear()
+        self._ready = None
+
+    async def send(
+            self,
+            target: discord.abc.Messageable,
+            content: str | None = None,
+            *,
+            priority: int = PRIORITY_NORMAL,
+            **kwargs) -> discord.Message | None:
+        """Queue a message and wait until it's sent
+
+        Args:
+            target: context, channel or user to send to
+            content: message content
+            priority: PRIORITY_DRAW, PRIORITY_NORMAL or PRIORITY_LOW
+            kwargs: other 'send' arguments (embed, embeds, file, ...)
+
+        Returns:
+            the sent message, shared with any identical send it was coalesced with
+        """
+        if content is not None:
+            kwargs["content"] = content
+        with phase("send"):
+            return await self._send(target, priority, kwargs)
+
+    async def _send(self, target: discord.abc.Messageable, priority: int, kwargs: dict) -> discord.Message | None:
+        if getattr(target, "interaction", None) is not None:
+            self.sent += 1
+            return await target.send(**kwargs)
+        self.start()
+        route_id = _route_id(target)
+        key = _coalesce_key(route_id, kwargs)
+        future = asyncio.get_running_loop().create_future()
+        item = self._pending.get(key) if key is not None else None
+        if item is not None:
+            self.coalesced += 1
+        else:
+            item = _Send(target, route_id, kwargs, key, priority)
+            if key is not None:
+                self._pending[key] = item
+            route = self._route(route_id)
+            heapq.heappush(route.items, (priority, next(self._seq), item))
+            self._queued_by_priority[priority] = self._queued_by_priority.get(priority, 0) + 1
+            if not route.scheduled:
+                route.scheduled = True
+                self._schedule(route)
+        item.futures.append(future)
+        return await future
+
+    def stats(self) -> DispatcherStats:
+        """Get the backlog and send stats"""
+        by_priority = {p: n for p, n in self._queued_by_priority.items() if n}
+        return DispatcherStats(
+                sum(by_priority.values()),
+                by_priority,
+                self.sent,
+                self.coalesced,
+                self.failed,
+                self.total_wait / self.sent if self.sent else 0.0,
+                self.max_wait)
+
+    def _route(self, route_id) -> _Route:
+        route = self._routes.get(route_id)
+        if route is None:
+            if len(self._routes) >= MAX_IDLE_ROUTES:
+                self._routes = {k: r for k, r in self._routes.items() if not r.idle()}
+            route = self._routes[route_id] = _Route()
+        return route
+
+    def _schedule(self, route: _Route):
+        """Put a route on the ready queue once it has a token"""
+        route.timer = None
+        if self._ready is None:
+            return
+        delay = route.bucket.delay()
+        if delay > 0:
+            route.timer = asyncio.get_running_loop().call_later(delay, self._schedule, route)
+        else:
+            self._ready.put_nowait((route.items[0][0], next(self._seq), route))
+
+    async def _work(self):
+        while True:
+            _, _, route = await self._ready.get()
+            priority, _, item = heapq.heappop(route.items)
+            self._queued_by_priority[priority] -= 1
+            if item.key is not None and self._pending.get(item.key) is item:
+                del self._pending[item.key]
+            route.bucket.take()
+            try:
+                await self._global.acquire()
+                wait = time.monotonic() - item.queued_at
+                message = await item.target.send(**item.kwargs)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Unable to send message to {}: {}".format(item.route_id, e))
+                for future in item.futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.sent += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                for future in item.futures:
+                    if not future.done():
+                        future.set_result(message)
+            finally:
+                if route.items:
+                    self._schedule(route)
+                else:
+                    route.scheduled = False
+
+dispatcher = Dispatcher()
@@ -0,0 +1,146 @@
+import random
+from typing import Any, Sequence
+
+"""
+Draw engine
+
+Runs the draw rules (see README) independently of discord so they can be tested and
+benchmarked on their own. Entries are any objects with 'name', 'first' and 'user_id'
+attributes (e.g. entries controller 'RespEntry').
+
+Entries keep their original order and are removed in place, with a Fenwick tree over
+their weights so a weighted pick is O(log n) without expanding first picks into the
+list. For the same random.Random state the winners are the same as picking with
+'random.choice' from the expanded list.
+"""
+
+class DrawEngine:
+    def __init__(self, entries: Sequence[Any], rng: random.Random | None = None):
+        self.entries = list(entries)
+        self.rng = rng or random.Random()
+        self.had_unanimous = False
+        n = len(self.entries)
+        self._alive = [True] * n
+        self._weights = [0] * n
+        self._tree = [0] * (n + 1)
+        self._total = 0
+        self._remaining = n
+        self._first_alive = 0
+        # Inverted indexes of the remaining entries
+        self._by_name: dict[str, set[int]] = {}
+        self._by_user: dict[int, set[int]] = {}
+        self._name_users: dict[str, dict[int, int]] = {}
+        for i, e in enumerate(self.entries):
+            self._by_name.setdefault(e.name, set()).add(i)
+            self._by_user.setdefault(e.user_id, set()).add(i)
+            name_users = self._name_users.setdefault(e.name, {})
+            name_users[e.user_id] = name_users.get(e.user_id, 0) + 1
+            self._set_weight(i, self._weight(e))
+
+    def __len__(self) -> int:
+        return self._remaining
+
+    def __bool__(self) -> bool:
+        return self._remaining > 0
+
+    """
+    Rules
+    """
+
+    def take_unanimous(self) -> str | None:
+        """RULE_1: Find a choice picked by every remaining user and remove it
+
+        Returns:
+            the unanimous choice or None
+        """
+        if not self:
+            return None
+        # A unanimous choice must be one of any single user's choices, so only the
+        # first remaining entry's user needs checking
+        while not self._alive[self._first_alive]:
+            self._first_alive += 1
+        user_id = self.entries[self._first_alive].user_id
+        num_users = len(self._by_user)
+        for i in sorted(self._by_user[user_id]):
+            name = self.entries[i].name
+            if len(self._name_users[name]) == num_users:
+                for j in list(self._by_name[name]):
+                    self._remove(j)
+                if not self.had_unanimous:
+                    # RULE_2 no longer applies so drop the first pick extra entries
+                    self.had_unanimous = True
+                    for j, e in enumerate(self.entries):
+                        if self._alive[j] and e.first:
+                            self._set_weight(j, 1)
+                return name
+        return None
+
+    def candidates(self) -> list[tuple[Any, int]]:
+        """Get the remaining entries and their number of entries in the draw
+
+        Returns:
+            (entry, weight) in entry order
+        """
+        return [(e, self._weights[i]) for i, e in enumerate(self.entries) if self._alive[i]]
+
+    def draw_winner(self) -> Any | None:
+        """Pick a winner weighted by RULE_2 and remove what RULE_3 and RULE_4 exclude
+
+        Returns:
+            the winning entry or None if there are no entries left
+        """
+        if not self:
+            return None
+        winner_index = self._find(self.rng.randrange(self._total))
+        winner = self.entries[winner_index]
+        for i in self._by_user[winner.user_id] | self._by_name[winner.name]:
+            self._remove(i)
+        return winner
+
+    """
+    Internals
+    """
+
+    def _weight(self, entry: Any) -> int:
+        return 2 if entry.first and not self.had_unanimous else 1
+
+    def _set_weight(self, i: int, weight: int):
+        delta = weight - self._weights[i]
+        self._weights[i] = weight
+        self._total += delta
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, target: int) -> int:
+        """Find the entry covering position 'target' of the expanded draw list"""
+        pos = 0
+        step = 1 << len(self._tree).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def _remove(self, i: int):
+        if not self._alive[i]:
+            return
+        e = self.entries[i]
+        self._alive[i] = False
+        self._remaining -= 1
+        self._set_weight(i, 0)
+        self._by_name[e.name].discard(i)
+        if not self._by_name[e.name]:
+            del self._by_name[e.name]
+            del self._name_users[e.name]
+        else:
+            name_users = self._name_users[e.name]
+            name_users[e.user_id] -= 1
+            if not name_users[e.user_id]:
+                del name_users[e.user_id]
+        self._by_user[e.user_id].discard(i)
+        if not self._by_user[e.user_id]:
+            del self._by_user[e.user_id]
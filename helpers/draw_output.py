@@ -0,0 +1,86 @@
+import random
+from collections import namedtuple
+from typing import Any, Sequence
+
+import discord
+
+from helpers.logger import logger
+from helpers.draw_engine import DrawEngine
+from helpers.members import member_cache
+from helpers.output import MessageBuffer
+
+"""
+Draw output
+
+Runs a draw over a guild's entries and composes its results, resolving the users
+who entered. Shared by the draw command and the benchmarks so both run the same
+code.
+"""
+
+"""
+Response Types
+"""
+
+# 'exhausted' is set if the entries ran out before 'count' winners were drawn
+DrawResult = namedtuple('DrawResult', 'winners exhausted')
+
+async def compose_draw(
+        output: MessageBuffer,
+        guild: discord.Guild,
+        entries: Sequence[Any],
+        count: int,
+        rng: random.Random | None = None) -> DrawResult:
+    """Draw up to 'count' winners and add the lists and results to the output
+
+    Args:
+        output: buffer to add the results to
+        guild: guild the entries are in, to resolve the users
+        entries: the guild's entries
+        count: number of winners to draw
+        rng: random source for the draw
+
+    Returns:
+        the winning entries, and if the entries ran out first
+    """
+    members = await member_cache.resolve(guild, (e.user_id for e in entries))
+    engine = DrawEngine(entries, rng)
+    winners_list = []
+    for draw_round in range(1, count + 1):
+        if not engine:
+            output.add_line('No more entries to draw from.')
+            return DrawResult(winners_list, True)
+        # RULE_1: If a all users picked an entry, it wins automatically
+        # -------------------------------------------------------------
+        unanimous = engine.take_unanimous()
+        if unanimous is not None:
+            # Entry is unanimous so everyone wins. No need to enter into winners list
+            output.add_line('**"{}"** automatically wins since selected by all users.'.format(unanimous))
+            continue
+        # RULE_2: All first picks get two entries in the draw unless we have already drawn a unanimous pick
+        # -------------------------------------------------------------------------------------------------
+        # List the entries being selected from
+        list_lines = []
+        i = 0
+        for item, weight in engine.candidates():
+            user = members.get(int(item.user_id))
+            for _ in range(weight):
+                i += 1
+                if user:
+                    list_lines.append(f"{i}. {item.name} ({user.name})")
+        output.add_embed("Selecting winner {} from list".format(draw_round), list_lines)
+        # Select winner
+        # RULE_3: If a user wins, their entries are removed from the draw list
+        # RULE_4: If a choice wins, it can't be selected again so remove from draw list
+        # -------------------------------------------------------------------------------------
+        winner = engine.draw_winner()
+        user = winner and members.get(int(winner.user_id))
+        if winner and user:
+            winners_list.append(winner)
+            # Output winner
+            output.add_line('**Winner {} is "{}"** entered by {}.'.format(draw_round, winner.name, user.mention))
+            continue
+        else:
+            output.add_line('Unable to draw a winner. Something went wrong')
+            logger.error('Error drawing winner (winner, user): ({}, {})'.format(winner, user))
+            break
+    return DrawResult(winners_list, False)
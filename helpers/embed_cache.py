@@ -0,0 +1,106 @@
+import json
+from collections import OrderedDict, namedtuple
+from typing import Hashable
+
+import discord
+
+from helpers.config import config as app_config
+
+"""
+Response Types
+"""
+
+EmbedCacheStats = namedtuple('EmbedCacheStats', 'embeds size max_size hits misses')
+
+class EmbedCache:
+    """LRU cache of rendered embeds per guild
+
+    Each guild has a version that is bumped whenever something shown in its embeds
+    changes (entries, history or member names). Embeds are stored with the version
+    they were rendered from, so a bump makes all of the guild's embeds stale at once.
+    The least recently used embeds are evicted past 'max_size' (approximate bytes of
+    the embeds' JSON payloads); a 'max_size' of 0 or less disables the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._versions: dict[int, int] = {}
+        self._epoch = 0
+        self._embeds: OrderedDict[tuple[int, Hashable], tuple[int, discord.Embed, int]] = OrderedDict()
+        self._keys: dict[int, set[Hashable]] = {}
+
+    def version(self, guild_id: int) -> int:
+        """Get a guild's version, to pass to 'put' once the embed is rendered"""
+        return self._epoch + self._versions.get(guild_id, 0)
+
+    def get(self, guild_id: int, key: Hashable) -> discord.Embed | None:
+        """Get an embed rendered from the guild's current version
+
+        Args:
+            guild_id: guild the embed is for
+            key: what the embed shows (ex. "draw_list")
+        """
+        item = self._embeds.get((guild_id, key))
+        if item is None or item[0] != self.version(guild_id):
+            self.misses += 1
+            return None
+        self._embeds.move_to_end((guild_id, key))
+        self.hits += 1
+        return item[1]
+
+    def put(self, guild_id: int, key: Hashable, version: int, embed: discord.Embed):
+        """Cache an embed, unless the guild changed since it was rendered
+
+        Args:
+            guild_id: guild the embed is for
+            key: what the embed shows (ex. "draw_list")
+            version: the guild's version from before its data was read
+            embed: rendered embed
+        """
+        if version != self.version(guild_id):
+            return
+        size = len(json.dumps(embed.to_dict()))
+        if size > self.max_size:
+            return
+        self._remove(guild_id, key)
+        self._embeds[(guild_id, key)] = (version, embed, size)
+        self._keys.setdefault(guild_id, set()).add(key)
+        self.size += size
+        while self.size > self.max_size:
+            (evicted_guild_id, evicted_key), _ = next(iter(self._embeds.items()))
+            self._remove(evicted_guild_id, evicted_key)
+
+    def bump(self, guild_id: int):
+        """Mark a guild's embeds stale
+
+        Args:
+            guild_id: guild that changed
+        """
+        self._versions[guild_id] = self._versions.get(guild_id, 0) + 1
+        for key in list(self._keys.get(guild_id, ())):
+            self._remove(guild_id, key)
+
+    def bump_all(self):
+        """Mark every guild's embeds stale"""
+        self._epoch += 1
+        self._embeds.clear()
+        self._keys.clear()
+        self.size = 0
+
+    def stats(self) -> EmbedCacheStats:
+        return EmbedCacheStats(len(self._embeds), self.size, self.max_size, self.hits, self.misses)
+
+    def _remove(self, guild_id: int, key: Hashable):
+        item = self._embeds.pop((guild_id, key), None)
+        if item is None:
+            return
+        self.size -= item[2]
+        keys = self._keys[guild_id]
+        keys.discard(key)
+        if not keys:
+            del self._keys[guild_id]
+
+embed_cache = EmbedCache(app_config["embed_cache_max_kb"] * 1024)
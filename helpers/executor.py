@@ -0,0 +1,75 @@
+import asyncio
+import time
+from collections import namedtuple
+from typing import Any, Awaitable, Callable
+
+"""
+Response Types
+"""
+
+ExecutorStats = namedtuple('ExecutorStats', 'queued in_flight completed avg_wait max_wait')
+
+class KeyedExecutor:
+    """Run jobs with a cap on how many run at once and only one at a time per key
+
+    Used for the draws so many guilds waking up at the same time don't all hit the
+    db and discord at once, and so a manual and an automatic draw can't overlap in
+    one guild.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._lock_users: dict[int, int] = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> ExecutorStats:
+        """Get the queue depth and wait times
+
+        Returns:
+            the stats, waits in seconds
+        """
+        avg_wait = self.total_wait / self.completed if self.completed else 0.0
+        return ExecutorStats(self.queued, self.in_flight, self.completed, avg_wait, self.max_wait)
+
+    async def run(self, key: int, func: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Run a job once its key is free and there is a free slot
+
+        Args:
+            key: jobs with the same key never run at the same time
+            func: coroutine function to run
+            args: arguments for func
+
+        Returns:
+            the job's result
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        self.queued += 1
+        waiting = True
+        start = time.monotonic()
+        try:
+            async with lock, self._semaphore:
+                waiting = False
+                self.queued -= 1
+                wait = time.monotonic() - start
+                self.in_flight += 1
+                try:
+                    return await func(*args)
+                finally:
+                    self.in_flight -= 1
+                    self.completed += 1
+                    self.total_wait += wait
+                    self.max_wait = max(self.max_wait, wait)
+        finally:
+            if waiting:
+                self.queued -= 1
+            self._lock_users[key] -= 1
+            if self._lock_users[key] == 0:
+                del self._lock_users[key]
+                del self._locks[key]
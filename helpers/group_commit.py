@@ -0,0 +1,135 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import aiosqlite
+
+from helpers.logger import logger
+from helpers.db import connection
+
+# An operation runs its statements on the given connection without committing
+Operation = Callable[..., Awaitable[Any]]
+
+class _Pending:
+    __slots__ = ("func", "args", "future")
+
+    def __init__(self, func: Operation, args: tuple, future: asyncio.Future):
+        self.func = func
+        self.args = args
+        self.future = future
+
+class GroupCommitter:
+    """Coalesce small writes into one transaction (group commit)
+
+    Operations are queued and applied in submission order, so the last write for a
+    row wins, in one transaction every 'interval' seconds or as soon as 'max_ops' are
+    queued. Each operation runs in its own savepoint so a failing one doesn't undo the
+    rest, and its caller is only answered once the transaction has committed.
+    """
+
+    def __init__(self, interval: float, max_ops: int):
+        self.interval = interval
+        self.max_ops = max(1, max_ops)
+        self._queue: list[_Pending] = []
+        self._batch: list[_Pending] = []
+        self._queued = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._stopped)
+
+    async def stop(self):
+        """Commit everything queued and stop"""
+        # If the task died its pending operations have already failed
+        while (self._batch or self._queue) and self._running():
+            await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, func: Operation, *args) -> bool:
+        """Queue an operation and wait until it is committed
+
+        Args:
+            func: operation, called as func(db, *args)
+            args: operation arguments
+
+        Returns:
+            True if the operation was committed
+        """
+        if not self._running():
+            logger.error("Group commit isn't running, unable to queue operation")
+            return False
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(_Pending(func, args, future))
+        self._queued.set()
+        if len(self._queue) >= self.max_ops:
+            self._full.set()
+        return await future
+
+    async def flush(self):
+        """Commit everything queued so far, without waiting for the interval"""
+        futures = [p.future for p in self._batch + self._queue]
+        if futures:
+            self._full.set()
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    def _running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _stopped(self, task: asyncio.Task):
+        """Fail whatever is still pending once the task ends, so nothing waits forever"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Group commit stopped: {}".format(task.exception()))
+        pending = self._batch + self._queue
+        self._batch = []
+        self._queue = []
+        for p in pending:
+            if not p.future.done():
+                p.future.set_result(False)
+
+    async def _run(self):
+        while True:
+            await self._queued.wait()
+            if len(self._queue) < self.max_ops:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch, self._queue = self._queue[:self.max_ops], self._queue[self.max_ops:]
+            if len(self._queue) < self.max_ops:
+                self._full.clear()
+            if not self._queue:
+                self._queued.clear()
+            await self._commit(self._batch)
+            self._batch = []
+
+    async def _commit(self, batch: list[_Pending]):
+        results = [False] * len(batch)
+        try:
+            async with connection() as db:
+                await db.execute("BEGIN IMMEDIATE")
+                for i, pending in enumerate(batch):
+                    results[i] = await self._apply(db, pending)
+                await db.commit()
+        except Exception as e:
+            logger.error("Group commit of {} operations failed: {}".format(len(batch), e))
+            results = [False] * len(batch)
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def _apply(self, db: aiosqlite.Connection, pending: _Pending) -> bool:
+        await db.execute("SAVEPOINT op")
+        try:
+            await pending.func(db, *pending.args)
+            await db.execute("RELEASE op")
+            return True
+        except Exception as e:
+            logger.error(e)
+            await db.execute("ROLLBACK TO op")
+            await db.execute("RELEASE op")
+            return False
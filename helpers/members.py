@@ -0,0 +1,119 @@
+import asyncio
+from typing import Iterable
+
+import discord
+
+from helpers.logger import logger
+
+# Max ids per gateway member query
+QUERY_CHUNK_SIZE = 100
+
+class MemberCache:
+    """Resolve member ids to members and names without scanning the member list
+
+    Members are looked up by id from discord.py's member cache and the ids it
+    doesn't have are fetched in batches. Names (including members known to have
+    left) are cached per guild until a member event invalidates them.
+    """
+
+    def __init__(self):
+        self._names: dict[int, dict[int, str | None]] = {}
+
+    async def resolve(self, guild: discord.Guild, user_ids: Iterable[int]) -> dict[int, discord.Member]:
+        """Resolve ids to members, fetching the ones not in the member cache
+
+        Args:
+            guild: guild the members are in
+            user_ids: ids to resolve
+
+        Returns:
+            user id -> member, for the ids still in the guild
+        """
+        names = self._names.setdefault(guild.id, {})
+        result = {}
+        missing = []
+        for user_id in set(user_ids):
+            member = guild.get_member(user_id)
+            if member:
+                result[user_id] = member
+                names[user_id] = member.name
+            elif user_id not in names:
+                missing.append(user_id)
+        members, failed = await self._fetch(guild, missing)
+        for member in members:
+            result[member.id] = member
+            names[member.id] = member.name
+        # Only ids a successful query didn't return have left, failed ones are tried again next time
+        for user_id in set(missing) - failed:
+            names.setdefault(user_id, None)
+        return result
+
+    async def names(self, guild: discord.Guild, user_ids: Iterable[int]) -> dict[int, str]:
+        """Resolve ids to user names
+
+        Args:
+            guild: guild the members are in
+            user_ids: ids to resolve
+
+        Returns:
+            user id -> name, for the ids still in the guild
+        """
+        names = self._names.setdefault(guild.id, {})
+        result = {}
+        unknown = []
+        for user_id in set(user_ids):
+            if user_id in names:
+                if names[user_id] is not None:
+                    result[user_id] = names[user_id]
+            else:
+                unknown.append(user_id)
+        if unknown:
+            for user_id, member in (await self.resolve(guild, unknown)).items():
+                result[user_id] = member.name
+        return result
+
+    def invalidate(self, guild_id: int, user_id: int):
+        """Forget a member's cached name
+
+        Args:
+            guild_id: guild the member is in
+            user_id: member to forget
+        """
+        if guild_id in self._names:
+            self._names[guild_id].pop(user_id, None)
+
+    def invalidate_user(self, user_id: int):
+        """Forget a user's cached name in every guild
+
+        Args:
+            user_id: user to forget
+        """
+        for names in self._names.values():
+            names.pop(user_id, None)
+
+    def invalidate_guild(self, guild_id: int):
+        """Forget all cached names for a guild
+
+        Args:
+            guild_id: guild to forget
+        """
+        self._names.pop(guild_id, None)
+
+    async def _fetch(self, guild: discord.Guild, user_ids: list[int]) -> tuple[list[discord.Member], set[int]]:
+        """Fetch members missing from the member cache in batches
+
+        Returns:
+            the members found, and the ids whose query failed
+        """
+        members = []
+        failed = set()
+        for i in range(0, len(user_ids), QUERY_CHUNK_SIZE):
+            chunk = user_ids[i:i + QUERY_CHUNK_SIZE]
+            try:
+                members += await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+            except (asyncio.TimeoutError, discord.ClientException) as e:
+                logger.error("Unable to fetch members for guild {}: {}".format(guild.id, e))
+                failed.update(chunk)
+        return members, failed
+
+member_cache = MemberCache()
@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import functools
+import math
+import time
+from contextvars import ContextVar
+from typing import Callable
+
+from helpers.logger import logger
+
+"""
+Metrics
+
+Counters, gauges and histograms served on a local HTTP endpoint in the Prometheus
+text exposition format (https://prometheus.io/docs/instrumenting/exposition_formats/).
+
+Commands are timed with a 'CommandTimer'. While one runs, time spent in checks, db
+connections and message sends is added to the command's phases with 'phase' (or
+the 'timed' decorator), so each command's latency can be broken down.
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("checks", "db", "send")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, _escape(v)) for k, v in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        """Get (name, labels, value) samples"""
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = ["# HELP {} {}".format(self.name, self.help), "# TYPE {} {}".format(self.name, self.type)]
+        for name, labels, value in self.samples():
+            lines.append("{}{} {}".format(name, _format_labels(labels), _format_value(value)))
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + value
+
+class Gauge(Metric):
+    """Gauge set directly or read from 'func' when scraped"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), func: Callable[[], float] | None = None):
+        super().__init__(name, help, labels)
+        self.func = func
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        if self.func is not None:
+            return [(self.name, {}, self.func())]
+        return super().samples()
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self._values[key] = (counts, total + value)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        samples = []
+        for key, (counts, total) in self._values.items():
+            labels = dict(zip(self.labels, key))
+            for bound, count in zip(self.buckets, counts):
+                samples.append((self.name + "_bucket", {**labels, "le": _format_value(bound)}, count))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, counts[-1]))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the text exposition format"""
+        parts = []
+        for metric in self.metrics.values():
+            try:
+                parts.append(metric.render())
+            except Exception as e:
+                logger.error("Unable to render metric '{}': {}".format(metric.name, e))
+        return "\n".join(parts) + "\n"
+
+registry = Registry()
+
+command_duration = registry.register(Histogram(
+        "bot_command_duration_seconds", "Time to run a command, including its checks", ("command",)))
+command_phase_duration = registry.register(Histogram(
+        "bot_command_phase_duration_seconds", "Time a command spent in checks, db or sends", ("command", "phase")))
+command_errors = registry.register(Counter(
+        "bot_command_errors_total", "Command errors handled by on_command_error", ("command", "error")))
+
+"""
+Command timing
+"""
+
+_command_phases: ContextVar[dict[str, float] | None] = ContextVar("command_phases", default=None)
+
+class CommandTimer:
+    """Time a command and the phases it goes through
+
+    Created in the command's task, so phases it goes through from then on are added
+    to it, and stopped wherever the command ends (it only counts once).
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.start = time.perf_counter()
+        self.stopped = False
+        _command_phases.set(self.phases)
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        command_duration.observe(time.perf_counter() - self.start, command=self.command)
+        for name, seconds in self.phases.items():
+            command_phase_duration.observe(seconds, command=self.command, phase=name)
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Add the time spent in the block to the running command's phase, if any
+
+    Args:
+        name: one of PHASES
+    """
+    phases = _command_phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+def timed(name: str):
+    """Decorate a coroutine function to add its time to the running command's phase"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with phase(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+"""
+Endpoint
+"""
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Skip the headers
+        while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+            pass
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status = "200 OK"
+            body = registry.render().encode("utf-8")
+        else:
+            status = "404 Not Found"
+            body = b"Not found\n"
+        writer.write("HTTP/1.1 {}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     "Content-Length: {}\r\nConnection: close\r\n\r\n".format(status, len(body)).encode("latin-1"))
+        writer.write(body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(host: str, port: int) -> asyncio.Server:
+    """Serve the metrics at http://host:port/metrics
+
+    Args:
+        host: address to listen on
+        port: port to listen on
+    """
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info("Serving metrics on http://{}:{}/metrics".format(host, port))
+    return server
@@ -0,0 +1,106 @@
+import asyncio
+
+import discord
+
+from helpers.dispatcher import dispatcher, PRIORITY_NORMAL
+
+"""
+Batched channel output
+
+Long outputs are composed in a 'MessageBuffer' and packed into as few messages as
+the message and embed limits allow, then sent through the dispatcher, which paces
+them to the channel's rate limit.
+"""
+
+# https://discord.com/developers/docs/resources/message#create-message
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_TITLE_LENGTH = 256
+MAX_EMBED_DESCRIPTION_LENGTH = 4096
+MAX_EMBED_TOTAL_LENGTH = 6000
+
+def _truncate(text: str, length: int) -> str:
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+class MessageBuffer:
+    """Collect lines and embeds and send them as few messages as possible
+
+    Lines are sent as message content (so mentions notify) and embeds keep their
+    place among them, with long embeds split into numbered pages.
+    """
+
+    def __init__(self):
+        # Lines and embeds in the order they were added
+        self.items: list[str | discord.Embed] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def add_line(self, line: str):
+        self.items.append(_truncate(line, MAX_CONTENT_LENGTH))
+
+    def add_embed(self, title: str, lines: list[str], color: int = 0x00ff00):
+        """Add an embed listing lines, paginated to the embed limits
+
+        Args:
+            title: embed title, numbered if there's more than one page
+            lines: description lines
+            color: embed color
+        """
+        page_length = min(MAX_EMBED_DESCRIPTION_LENGTH, MAX_EMBED_TOTAL_LENGTH - MAX_EMBED_TITLE_LENGTH)
+        pages = []
+        page = []
+        length = 0
+        for line in lines:
+            line = _truncate(line, page_length)
+            if page and length + len(line) + 1 > page_length:
+                pages.append(page)
+                page = []
+                length = 0
+            page.append(line)
+            length += len(line) + 1
+        pages.append(page)
+        for i, page in enumerate(pages):
+            page_title = title if len(pages) == 1 else "{} ({}/{})".format(title, i + 1, len(pages))
+            self.items.append(discord.Embed(
+                    title=_truncate(page_title, MAX_EMBED_TITLE_LENGTH), description="\n".join(page), color=color))
+
+    def messages(self) -> list[dict]:
+        """Pack the lines and embeds into 'channel.send' arguments, in order
+
+        A message's content shows above its embeds, so a line added after an embed
+        starts a new message.
+        """
+        messages = []
+        content = ""
+        embeds = []
+        embeds_length = 0
+        for item in self.items:
+            if isinstance(item, str):
+                if embeds or (content and len(content) + len(item) + 1 > MAX_CONTENT_LENGTH):
+                    messages.append((content, embeds))
+                    content, embeds, embeds_length = "", [], 0
+                content = item if not content else content + "\n" + item
+            else:
+                if embeds and (len(embeds) == MAX_EMBEDS_PER_MESSAGE
+                               or embeds_length + len(item) > MAX_EMBED_TOTAL_LENGTH):
+                    messages.append((content, embeds))
+                    content, embeds, embeds_length = "", [], 0
+                embeds.append(item)
+                embeds_length += len(item)
+        if content or embeds:
+            messages.append((content, embeds))
+        return [{k: v for k, v in (("content", content), ("embeds", embeds)) if v} for content, embeds in messages]
+
+    async def send(self, channel: discord.abc.Messageable, priority: int = PRIORITY_NORMAL):
+        """Send everything and empty the buffer
+
+        Args:
+            channel: channel to send to
+            priority: dispatcher priority
+        """
+        messages = self.messages()
+        self.items = []
+        # Queue every page before waiting on any, so they go out back to back and in
+        # order rather than letting other sends to the channel in between
+        await asyncio.gather(*(dispatcher.send(channel, priority=priority, **message) for message in messages))
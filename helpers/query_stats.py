@@ -0,0 +1,120 @@
+import re
+from collections import namedtuple
+from typing import Sequence
+
+import aiosqlite
+
+from helpers.logger import logger
+from helpers import metrics
+
+"""
+Db query instrumentation
+
+The statements the controllers run through 'helpers.db' ('execute', 'executemany',
+'fetch_all', 'fetch_one' and 'stream') are timed and their rows counted (rows
+changed for writes, rows fetched for reads, including the time spent fetching
+them), grouped by the statement's SQL. Statements slower than the slow query
+threshold are logged with their 'EXPLAIN QUERY PLAN'.
+"""
+
+"""
+Response Types
+"""
+
+QueryStats = namedtuple('QueryStats', 'sql calls rows total_time max_time')
+WaitStats = namedtuple('WaitStats', 'waits total_time max_time')
+
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+statement_duration = metrics.registry.register(metrics.Histogram(
+        "bot_db_statement_duration_seconds", "Time to run a db statement", ("operation",)))
+connection_wait = metrics.registry.register(metrics.Histogram(
+        "bot_db_connection_wait_seconds", "Time waiting for a pooled db connection"))
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+class QueryTracker:
+    """Per statement timing and row counts, and pooled connection wait times
+
+    Statements taking at least 'slow_threshold' seconds are logged (None to disable).
+    """
+
+    def __init__(self, slow_threshold: float | None = None):
+        self.slow_threshold = slow_threshold
+        self._stats: dict[str, list] = {}
+        self._waits = [0, 0.0, 0.0]
+
+    def record(self, sql: str, elapsed: float, rows: int):
+        """Record a statement's run
+
+        Args:
+            sql: statement
+            elapsed: seconds to run it and fetch its rows
+            rows: rows changed or fetched
+        """
+        sql = _normalize(sql)
+        # [calls, rows, total_time, max_time]
+        stats = self._stats.setdefault(sql, [0, 0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += rows
+        stats[2] += elapsed
+        stats[3] = max(stats[3], elapsed)
+        statement_duration.observe(elapsed, operation=sql.split(" ", 1)[0].upper())
+
+    async def observe(
+            self,
+            db: aiosqlite.Connection,
+            sql: str,
+            params: Sequence | None,
+            elapsed: float,
+            rows: int):
+        """Record a statement's run and log it if it was slow
+
+        Args:
+            db: connection it ran on, to explain it
+            sql: statement
+            params: its parameters, or None if it can't be explained (e.g. executemany)
+            elapsed: seconds to run it and fetch its rows
+            rows: rows changed or fetched
+        """
+        self.record(sql, elapsed, rows)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            await self._log_slow(db, sql, params, elapsed, rows)
+
+    def record_wait(self, seconds: float):
+        """Record the time spent waiting for a pooled connection"""
+        self._waits[0] += 1
+        self._waits[1] += seconds
+        self._waits[2] = max(self._waits[2], seconds)
+        connection_wait.observe(seconds)
+
+    def slowest(self, count: int) -> list[QueryStats]:
+        """Get the statements with the slowest single run
+
+        Args:
+            count: number of statements
+        """
+        stats = sorted(self._stats.items(), key=lambda item: item[1][3], reverse=True)[:count]
+        return [QueryStats(sql, *values) for sql, values in stats]
+
+    def wait_stats(self) -> WaitStats:
+        return WaitStats(*self._waits)
+
+    def reset(self):
+        self._stats.clear()
+        self._waits = [0, 0.0, 0.0]
+
+    async def _log_slow(self, db: aiosqlite.Connection, sql: str, params: Sequence | None, elapsed: float, rows: int):
+        plan = "n/a"
+        if params is not None and _EXPLAINABLE_RE.match(sql):
+            try:
+                async with db.execute("EXPLAIN QUERY PLAN " + sql, params) as cursor:
+                    steps = await cursor.fetchall()
+                plan = "; ".join(step[-1] for step in steps) or "n/a"
+            except Exception as e:
+                plan = "unavailable ({})".format(e)
+        logger.warning("Slow query ({:.1f} ms, {} rows): {} | plan: {}".format(
+                elapsed * 1000, rows, _normalize(sql), plan))
+
+query_tracker = QueryTracker()
@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import namedtuple
+from typing import Awaitable, Callable
+
+from helpers.logger import logger
+
+"""
+Response Types
+"""
+
+SchedulerStats = namedtuple('SchedulerStats', 'due running fired avg_lag max_lag')
+
+# Longest single sleep so wall clock changes are picked up reasonably quickly
+MAX_SLEEP_SECONDS = 300
+
+class Scheduler:
+    """Single task scheduler for many keyed jobs backed by a min-heap of fire times
+
+    Jobs are keyed (e.g. by guild id) so each key has at most one pending fire time.
+    Scheduling, rescheduling and cancelling are O(log n); stale heap items left behind
+    by a reschedule or cancel are skipped when popped. Due jobs are handed to a fixed
+    number of worker tasks so the memory and timer overhead doesn't grow with the
+    number of keys.
+    """
+
+    def __init__(self, callback: Callable[[int], Awaitable[None]], workers: int):
+        self.callback = callback
+        self.workers = max(1, workers)
+        self._heap: list[tuple[float, int, int]] = []
+        self._pending: dict[int, tuple[float, int]] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        # (key, fire time) of jobs that are due but waiting for a worker
+        self._due: asyncio.Queue[tuple[int, float]] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self.running = 0
+        self.fired = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._pending
+
+    def stats(self) -> SchedulerStats:
+        """Get the due queue depth and how late jobs started
+
+        Returns:
+            the stats, lag in seconds from a job's fire time to it starting
+        """
+        avg_lag = self.total_lag / self.fired if self.fired else 0.0
+        return SchedulerStats(self._due.qsize(), self.running, self.fired, avg_lag, self.max_lag)
+
+    def next_fire_time(self, key: int) -> float | None:
+        """Get the epoch time a key is scheduled to fire at
+
+        Args:
+            key: job key
+
+        Returns:
+            epoch seconds or None if not scheduled
+        """
+        pending = self._pending.get(key)
+        return pending[0] if pending else None
+
+    def schedule(self, key: int, when: float):
+        """Schedule (or reschedule) a key to fire at a time
+
+        Args:
+            key: job key
+            when: epoch seconds to fire at
+        """
+        seq = next(self._counter)
+        self._pending[key] = (when, seq)
+        heapq.heappush(self._heap, (when, seq, key))
+        self._compact()
+        # Wake the timer in case this is now the earliest job
+        self._wakeup.set()
+
+    def cancel(self, key: int):
+        """Cancel a key's pending fire time
+
+        Args:
+            key: job key
+        """
+        if self._pending.pop(key, None) is not None:
+            self._compact()
+
+    def start(self):
+        """Start the timer and worker tasks"""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._timer()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Stop the timer and worker tasks, dropping anything pending"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._heap.clear()
+        self._pending.clear()
+        self._due = asyncio.Queue()
+        self.running = 0
+
+    def _compact(self):
+        """Rebuild the heap once it's mostly stale items"""
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._pending):
+            self._heap = [(when, seq, key) for key, (when, seq) in self._pending.items()]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, item: tuple[float, int, int]) -> bool:
+        when, seq, key = item
+        return self._pending.get(key) == (when, seq)
+
+    async def _timer(self):
+        """Sleep until the earliest job is due and queue everything that is due"""
+        while True:
+            self._wakeup.clear()
+            while self._heap and not self._is_live(self._heap[0]):
+                heapq.heappop(self._heap)
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                item = heapq.heappop(self._heap)
+                if self._is_live(item):
+                    del self._pending[item[2]]
+                    self._due.put_nowait((item[2], item[0]))
+            timeout = MAX_SLEEP_SECONDS
+            if self._heap:
+                timeout = min(timeout, max(0, self._heap[0][0] - now))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        """Run due jobs one at a time"""
+        while True:
+            key, when = await self._due.get()
+            lag = max(0.0, time.time() - when)
+            self.fired += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.running += 1
+            try:
+                await self.callback(key)
+            except Exception as e:
+                logger.error("Scheduled job for '{}' failed: {}".format(key, e))
+            finally:
+                self.running -= 1
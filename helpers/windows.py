@@ -0,0 +1,65 @@
+import calendar
+import datetime
+import re
+
+"""
+Stats time windows
+
+A window is a short phrase giving the start of the period the stats are for, up to now:
+* "last <n> days|weeks|months|years"
+* "since <yyyy-mm-dd>"
+* "today", "this week", "this month" or "this year"
+"""
+
+WINDOW_HELP = '"last <n> days/weeks/months/years", "since <yyyy-mm-dd>", "today", "this week", "this month" or "this year"'
+
+_LAST_RE = re.compile(r"^last\s+(\d+)\s+(day|week|month|year)s?$")
+_SINCE_RE = re.compile(r"^since\s+(\d{4}-\d{2}-\d{2})$")
+
+def parse_window(window: str, timezone: datetime.tzinfo) -> datetime.datetime:
+    """Parse a stats window into its start time
+
+    Args:
+        window: window phrase (see module docs)
+        timezone: timezone the window is in
+
+    Returns:
+        the start of the window
+
+    Raises:
+        ValueError: if the window can't be parsed
+    """
+    window = " ".join(window.lower().split())
+    now = datetime.datetime.now(timezone)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    match = _LAST_RE.match(window)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if unit == "day":
+            return now - datetime.timedelta(days=count)
+        if unit == "week":
+            return now - datetime.timedelta(weeks=count)
+        months = count * 12 if unit == "year" else count
+        year, month = divmod(now.month - 1 - months, 12)
+        year, month = now.year + year, month + 1
+        # Clamp the day for shorter months (e.g. one month before March 31st)
+        day = min(now.day, calendar.monthrange(year, month)[1])
+        return now.replace(year=year, month=month, day=day)
+
+    match = _SINCE_RE.match(window)
+    if match:
+        since = datetime.datetime.strptime(match.group(1), "%Y-%m-%d")
+        if hasattr(timezone, "localize"):
+            return timezone.localize(since)
+        return since.replace(tzinfo=timezone)
+
+    if window == "today":
+        return today
+    if window == "this week":
+        return today - datetime.timedelta(days=today.weekday())
+    if window == "this month":
+        return today.replace(day=1)
+    if window == "this year":
+        return today.replace(month=1, day=1)
+    raise ValueError("Unknown stats window '{}'".format(window))
@@ -7,9 +7,13 @@ from discord.ext import commands
 from discord.ext.commands import Bot, Context
 
 import exceptions
+import database.controllers.entries as entriesdb
 import database.controllers.guilds as guildsdb
-from helpers import db
+from helpers import db, metrics
 from helpers.logger import logger
+from helpers.members import member_cache
+from helpers.dispatcher import dispatcher
+from helpers.embed_cache import embed_cache
 from helpers.config import config as app_config
 
 """
@@ -31,6 +35,20 @@ bot = Bot(command_prefix=commands.when_mentioned_or(
     intents=intents,
     help_command=None)
 
+# Metrics
+# =======
+
+def autodraw_count() -> int:
+    draw_cog = bot.get_cog("draw")
+    return len(draw_cog.autodraw_scheduler) if draw_cog else 0
+
+metrics.registry.register(metrics.Gauge(
+    "bot_guilds", "Guilds the bot is in", func=lambda: len(bot.guilds)))
+metrics.registry.register(metrics.Gauge(
+    "bot_autodraws_scheduled", "Guilds with an autodraw scheduled", func=autodraw_count))
+metrics.registry.register(metrics.Gauge(
+    "bot_outbound_queued", "Messages waiting in the outbound dispatcher", func=lambda: dispatcher.stats().queued))
+
 # Events
 # ======
 
@@ -41,6 +59,14 @@ async def on_ready() -> None:
     logger.info(f"Python version: {platform.python_version()}")
     logger.info(
         f"Running on: {platform.system()} {platform.release()} ({os.name})")
+    if not await guildsdb.load_guild_cache():
+        logger.error("Unable to load the guild cache")
+    # Guilds pooled before a reconnect may have missed writes
+    diverged = await entriesdb.verify_entry_pool()
+    if diverged is None:
+        logger.error("Unable to verify the entry pool")
+    elif diverged:
+        logger.warning("Entry pool didn't match the db for guilds {}, reloading them".format(diverged))
 
 @bot.event
 async def on_guild_join(guild: discord.Guild) -> None:
@@ -52,6 +78,31 @@ async def on_guild_join(guild: discord.Guild) -> None:
 async def on_guild_remove(guild: discord.Guild) -> None:
     logger.info("Deleting guild from db: {}:{}".format(guild.id, guild.name))
     await guildsdb.delete_one_guild(guild.id)
+    member_cache.invalidate_guild(guild.id)
+    embed_cache.bump(guild.id)
+
+@bot.event
+async def on_member_join(member: discord.Member) -> None:
+    member_cache.invalidate(member.guild.id, member.id)
+    embed_cache.bump(member.guild.id)
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member) -> None:
+    if before.name != after.name:
+        member_cache.invalidate(after.guild.id, after.id)
+        embed_cache.bump(after.guild.id)
+
+@bot.event
+async def on_member_remove(member: discord.Member) -> None:
+    member_cache.invalidate(member.guild.id, member.id)
+    embed_cache.bump(member.guild.id)
+
+@bot.event
+async def on_user_update(before: discord.User, after: discord.User) -> None:
+    if before.name != after.name:
+        member_cache.invalidate_user(after.id)
+        for guild in after.mutual_guilds:
+            embed_cache.bump(guild.id)
 
 @bot.event
 async def on_message(message: discord.Message) -> None:
@@ -59,6 +110,26 @@ async def on_message(message: discord.Message) -> None:
         return
     await bot.process_commands(message)
 
+# Command timing
+# ==============
+
+@bot.check
+async def start_command_timer(ctx: Context) -> bool:
+    """Start timing the command before its own checks run
+
+    Global checks run first for both prefix and slash invocations, in the task
+    that runs the command. Stopped in 'after_invoke' or 'on_command_error'.
+    """
+    if getattr(ctx, "command_timer", None) is None:
+        ctx.command_timer = metrics.CommandTimer(ctx.command.qualified_name)
+    return True
+
+@bot.after_invoke
+async def stop_command_timer(ctx: Context) -> None:
+    timer = getattr(ctx, "command_timer", None)
+    if timer is not None:
+        timer.stop()
+
 @bot.event
 async def on_command_completion(ctx: Context) -> None:
     if not ctx.command:
@@ -75,6 +146,9 @@ async def on_command_completion(ctx: Context) -> None:
 
 @bot.event
 async def on_command_error(ctx: Context, error) -> None:
+    await stop_command_timer(ctx)
+    metrics.command_errors.inc(
+        command=ctx.command.qualified_name if ctx.command else "", error=type(error).__name__)
     if isinstance(error, exceptions.NotInChannel):
         """
         @checks.in_channel() check.
@@ -83,7 +157,7 @@ async def on_command_error(ctx: Context, error) -> None:
             description="Bot has not been configured to listen to this channel. See '!draw_listen'",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     elif isinstance(error, exceptions.NotInGuild):
         """
         @checks.in_guild() check.
@@ -92,7 +166,7 @@ async def on_command_error(ctx: Context, error) -> None:
             description="This command is only available in a server channel!",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     elif isinstance(error, exceptions.UserNotOwner):
         """
         @checks.is_owner() check.
@@ -101,7 +175,7 @@ async def on_command_error(ctx: Context, error) -> None:
             description="You are not the owner of the bot!",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
         guild_name = ctx.guild and ctx.guild.name or ""
         guild_id = ctx.guild and ctx.guild.id or ""
         logger.warning(
@@ -114,7 +188,7 @@ async def on_command_error(ctx: Context, error) -> None:
             description="You are not an admin!",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
         guild_name = ctx.guild and ctx.guild.name or ""
         guild_id = ctx.guild and ctx.guild.id or ""
         logger.warning(
@@ -127,21 +201,21 @@ async def on_command_error(ctx: Context, error) -> None:
             description=f"**Please slow down** - You can use this command again in {f'{round(hours)} hours' if round(hours) > 0 else ''} {f'{round(minutes)} minutes' if round(minutes) > 0 else ''} {f'{round(seconds)} seconds' if round(seconds) > 0 else ''}.",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     elif isinstance(error, commands.MissingPermissions):
         embed = discord.Embed(
             description="You are missing the permission(s) `" + ", ".join(
                 error.missing_permissions) + "` to execute this command!",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     elif isinstance(error, commands.BotMissingPermissions):
         embed = discord.Embed(
             description="I am missing the permission(s) `" + ", ".join(
                 error.missing_permissions) + "` to fully perform this command!",
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     elif isinstance(error, commands.MissingRequiredArgument):
         embed = discord.Embed(
             title="Error!",
@@ -149,7 +223,7 @@ async def on_command_error(ctx: Context, error) -> None:
             description=str(error).capitalize(),
             color=0xE02B2B
         )
-        await ctx.send(embed=embed)
+        await dispatcher.send(ctx, embed=embed)
     else:
         raise error
 
@@ -171,6 +245,29 @@ async def load_cogs() -> None:
 # Main
 # ====
 
-asyncio.run(db.init_db())
-asyncio.run(load_cogs())
-bot.run(app_config["token"])
+async def main() -> None:
+    discord.utils.setup_logging()
+    metrics_server = None
+    try:
+        async with bot:
+            # Open the db inside the bot's event loop so the pool is shared by all cogs
+            await db.init_db(
+                pool_size=app_config["db_pool_size"],
+                pragmas=app_config["db_pragmas"],
+                slow_query_ms=app_config["db_slow_query_ms"])
+            if app_config["entry_group_commit_ms"] > 0:
+                entriesdb.start_group_commit(
+                    app_config["entry_group_commit_ms"] / 1000,
+                    app_config["entry_group_commit_max_ops"])
+            if app_config["metrics_port"] > 0:
+                metrics_server = await metrics.serve(app_config["metrics_host"], app_config["metrics_port"])
+            await load_cogs()
+            await bot.start(app_config["token"])
+    finally:
+        if metrics_server:
+            metrics_server.close()
+        await dispatcher.stop()
+        await entriesdb.stop_group_commit()
+        await db.close_db()
+
+asyncio.run(main())
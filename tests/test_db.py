@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+
+from helpers import db
+from helpers.query_stats import query_tracker
+
+class TestQueryStats(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        await db.init_db(os.path.join(self.dir.name, "test.db"), pool_size=1)
+        query_tracker.reset()
+
+    async def asyncTearDown(self):
+        await db.close_db()
+        self.dir.cleanup()
+
+    async def test_statements_are_recorded(self):
+        async with db.connection() as conn:
+            await db.executemany(conn, "INSERT INTO users(id) VALUES (?)", [(1,), (2,), (3,)])
+            self.assertEqual(await db.execute(conn, "DELETE FROM users WHERE id=?", (3,)), 1)
+            await conn.commit()
+            rows = await db.fetch_all(conn, "SELECT id FROM users ORDER BY id", ())
+        self.assertEqual(rows, [(1,), (2,)])
+        self.assertEqual([row async for row in db.stream("SELECT id FROM users", (), None)], [(1,), (2,)])
+
+        stats = {s.sql: s for s in query_tracker.slowest(10)}
+        self.assertEqual(stats["INSERT INTO users(id) VALUES (?)"].rows, 3)
+        self.assertEqual(stats["DELETE FROM users WHERE id=?"].rows, 1)
+        self.assertEqual(stats["SELECT id FROM users ORDER BY id"].rows, 2)
+        self.assertEqual(stats["SELECT id FROM users"].calls, 1)
+        self.assertEqual(query_tracker.wait_stats().waits, 2)
+
+if __name__ == "__main__":
+    unittest.main()
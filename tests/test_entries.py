@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+import database.controllers.entries as entriesdb
+import database.controllers.entry_hist as entryhistdb
+import database.controllers.guilds as guildsdb
+from helpers import db
+
+class TestEntryPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        await db.init_db(os.path.join(self.dir.name, "test.db"), pool_size=2)
+        entriesdb.invalidate_entry_pool()
+        await guildsdb.create_one_guild(1, 10, 2, 3)
+        for user_id in range(3):
+            await entriesdb.submit_entries(1, user_id, ["a{}".format(user_id), "b"])
+        await entriesdb.read_all_entries_for_guild_cached(1)
+
+    async def asyncTearDown(self):
+        entriesdb.invalidate_entry_pool()
+        await db.close_db()
+        self.dir.cleanup()
+
+    async def test_draw_keeps_the_guild_pooled(self):
+        entries = await entriesdb.read_all_entries_for_guild_cached(1)
+        self.assertTrue(await entryhistdb.finalize_draw(1, [(e.name, False, e.guild_id, e.user_id) for e in entries]))
+        self.assertEqual(entriesdb._pool.get(1), {})
+        self.assertEqual(await entriesdb.read_all_entries_for_guild_cached(1), [])
+        await entriesdb.submit_entries(1, 5, ["c", "d"])
+        self.assertEqual([e.name for e in await entriesdb.read_all_entries_for_guild_cached(1)], ["c", "d"])
+        self.assertEqual(await entriesdb.verify_entry_pool(), [])
+
+    async def test_verify_finds_changed_picks(self):
+        self.assertEqual(await entriesdb.verify_entry_pool(), [])
+        # Same number of entries, different picks
+        async with db.connection() as conn:
+            await db.execute(conn, "UPDATE entries SET name='z' WHERE guild_id=1 AND user_id=0 AND first")
+            await conn.commit()
+        self.assertEqual(await entriesdb.verify_entry_pool(), [1])
+        self.assertNotIn(1, entriesdb._pool)
+        names = {e.name for e in await entriesdb.read_all_entries_for_guild_cached(1)}
+        self.assertIn("z", names)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from helpers import db
+from helpers.group_commit import GroupCommitter
+
+async def insert_user(conn, user_id: int):
+    await db.execute(conn, "INSERT INTO users(id) VALUES (?)", (user_id,))
+
+class TestGroupCommitter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        await db.init_db(os.path.join(self.dir.name, "test.db"), pool_size=2)
+
+    async def asyncTearDown(self):
+        await db.close_db()
+        self.dir.cleanup()
+
+    async def test_failed_operation_is_isolated(self):
+        committer = GroupCommitter(0.05, 100)
+        committer.start()
+        results = await asyncio.gather(
+                committer.submit(insert_user, 1), committer.submit(insert_user, 1), committer.submit(insert_user, 2))
+        await committer.stop()
+        self.assertEqual(results, [True, False, True])
+
+    async def test_stop_after_task_died(self):
+        committer = GroupCommitter(60, 100)
+        async def broken(batch):
+            raise RuntimeError("broken")
+        committer._commit = broken
+        committer.start()
+        pending = asyncio.create_task(committer.submit(insert_user, 1))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(committer.flush(), 1)
+        self.assertFalse(await pending)
+        self.assertFalse(await committer.submit(insert_user, 2))
+        await asyncio.wait_for(committer.stop(), 1)
+
+if __name__ == "__main__":
+    unittest.main()
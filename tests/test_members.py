@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from helpers.members import MemberCache, QUERY_CHUNK_SIZE
+
+class FakeGuild:
+    """Guild whose members are only cached once queried, and whose queries fail for chosen ids"""
+
+    def __init__(self, id: int, members: list[int], failing: set[int] = frozenset()):
+        self.id = id
+        self.members = {user_id: SimpleNamespace(id=user_id, name="user{}".format(user_id)) for user_id in members}
+        self.failing = set(failing)
+        self.cached = {}
+        self.queries = 0
+
+    def get_member(self, user_id: int):
+        return self.cached.get(user_id)
+
+    async def query_members(self, user_ids: list[int], limit: int, cache: bool):
+        self.queries += 1
+        if self.failing & set(user_ids):
+            raise asyncio.TimeoutError()
+        found = [self.members[user_id] for user_id in user_ids if user_id in self.members]
+        self.cached.update((member.id, member) for member in found)
+        return found
+
+class TestMemberCache(unittest.IsolatedAsyncioTestCase):
+    async def test_left_members_are_cached(self):
+        cache = MemberCache()
+        guild = FakeGuild(1, [1, 2])
+        self.assertEqual(set(await cache.resolve(guild, [1, 2, 3])), {1, 2})
+        self.assertEqual(await cache.names(guild, [3]), {})
+        self.assertEqual(guild.queries, 1)
+
+    async def test_failed_query_is_not_cached_as_left(self):
+        cache = MemberCache()
+        ids = list(range(QUERY_CHUNK_SIZE + 1))
+        guild = FakeGuild(1, ids, failing={0})
+        resolved = await cache.resolve(guild, ids)
+        # The failed chunk's members are unresolved but not marked as left
+        self.assertLess(len(resolved), len(ids))
+        guild.failing.clear()
+        self.assertEqual(set(await cache.resolve(guild, ids)), set(ids))
+        self.assertEqual(len(await cache.names(guild, ids)), len(ids))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+from helpers.dispatcher import Dispatcher, PRIORITY_DRAW, PRIORITY_LOW
+from helpers.output import MessageBuffer, MAX_CONTENT_LENGTH, MAX_EMBEDS_PER_MESSAGE
+import helpers.output as output
+
+class FakeChannel:
+    def __init__(self, id: int, dispatcher: Dispatcher):
+        self.id = id
+        self.dispatcher = dispatcher
+        self.sent: list[dict] = []
+        # Sends of each priority still queued when each message was sent
+        self.queued: list[dict] = []
+
+    async def send(self, **kwargs):
+        self.queued.append(dict(self.dispatcher.stats().queued_by_priority))
+        # Yield like a real request so other sends could get in between
+        await asyncio.sleep(0)
+        self.sent.append(kwargs)
+        return kwargs
+
+def titles(message: dict) -> list[str]:
+    return [embed.title for embed in message.get("embeds", [])]
+
+class TestMessageBuffer(unittest.TestCase):
+    def test_lines_and_embeds_keep_their_order(self):
+        buffer = MessageBuffer()
+        buffer.add_line("header")
+        buffer.add_embed("List 1", ["a", "b"])
+        buffer.add_line("winner 1")
+        buffer.add_embed("List 2", ["b"])
+        buffer.add_line("winner 2")
+        buffer.add_line("done")
+        messages = buffer.messages()
+        self.assertEqual([m.get("content") for m in messages], ["header", "winner 1", "winner 2\ndone"])
+        self.assertEqual([titles(m) for m in messages], [["List 1"], ["List 2"], []])
+
+    def test_limits_split_messages(self):
+        buffer = MessageBuffer()
+        for i in range(MAX_EMBEDS_PER_MESSAGE + 1):
+            buffer.add_embed("List {}".format(i), ["entry"])
+        buffer.add_line("x" * (MAX_CONTENT_LENGTH - 10))
+        buffer.add_line("y" * 20)
+        messages = buffer.messages()
+        self.assertEqual([len(titles(m)) for m in messages], [MAX_EMBEDS_PER_MESSAGE, 1, 0, 0])
+        self.assertNotIn("content", messages[0])
+        self.assertEqual(messages[3]["content"], "y" * 20)
+        self.assertTrue(all(len(m.get("content", "")) <= MAX_CONTENT_LENGTH for m in messages))
+
+class TestMessageBufferSend(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dispatcher = Dispatcher(workers=4)
+        self._dispatcher = output.dispatcher
+        output.dispatcher = self.dispatcher
+
+    async def asyncTearDown(self):
+        output.dispatcher = self._dispatcher
+        await self.dispatcher.stop()
+
+    async def test_pages_go_out_back_to_back(self):
+        channel = FakeChannel(1, self.dispatcher)
+        # Use up the channel's burst so the low priority sends are still queued
+        await asyncio.gather(*(self.dispatcher.send(channel, "burst {}".format(i)) for i in range(5)))
+        low = [asyncio.create_task(self.dispatcher.send(channel, "low {}".format(i), priority=PRIORITY_LOW))
+               for i in range(2)]
+        await asyncio.sleep(0)
+
+        buffer = MessageBuffer()
+        buffer.add_line("**Running the draw**")
+        for i in range(MAX_EMBEDS_PER_MESSAGE + 1):
+            buffer.add_embed("List {}".format(i), ["entry"])
+        pages = buffer.messages()
+        self.assertGreater(len(pages), 1)
+        await buffer.send(channel, PRIORITY_DRAW)
+        await asyncio.gather(*low)
+
+        sent = channel.sent[5:]
+        self.assertEqual(sent[:len(pages)], pages)
+        self.assertEqual([m["content"] for m in sent[len(pages):]], ["low 0", "low 1"])
+        # Every page was queued before the first one went out
+        self.assertEqual(channel.queued[5].get(PRIORITY_DRAW), len(pages) - 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,286 @@
+"""
+Offline benchmarks (no discord connection needed)
+
+Generates a synthetic database (guilds, users, live entries and years of weekly draw
+history), then times the draw (with the draw command's own code), the draw_enter db
+path, the stats reads, the history reads and the in_channel check. Each benchmark
+reports latency percentiles and throughput from untraced runs, plus the peak memory
+and the memory blocks still allocated after one run under tracemalloc. The same arguments and seed give the same
+data, so results can be compared across commits.
+
+Usage:
+    python -m tools.benchmark [--rows <history rows>] [--guilds <n>] [--users <per guild>]
+                              [--years <n>] [--iterations <n>] [--seed <n>]
+                              [--only <benchmark> ...] [--db <path>] [--output <file.json>]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import database.controllers.entries as entriesdb
+import database.controllers.entry_hist as entryhistdb
+import database.controllers.guilds as guildsdb
+import database.controllers.stats as statsdb
+from helpers import db
+from helpers.draw_output import compose_draw
+from helpers.output import MessageBuffer
+
+NAMES_PER_GUILD = 60
+WINNERS_PER_DRAW = 2
+DRAW_ROUNDS = 5
+INSERT_BATCH_SIZE = 10000
+
+"""
+Data
+"""
+
+async def generate(args) -> dict:
+    """Fill an empty db with synthetic data
+
+    Returns:
+        counts of the generated rows
+    """
+    rng = random.Random(args.seed)
+    now = int(time.time())
+    start = now - int(args.years * 365 * 86400)
+    guild_ids = list(range(1, args.guilds + 1))
+    users = {g: [g * 1000000 + u for u in range(args.users)] for g in guild_ids}
+    names = {g: ["entry{}".format(n) for n in range(NAMES_PER_GUILD)] for g in guild_ids}
+
+    # Weekly draws per guild, enough to make up the history rows
+    rows_per_draw = 2 * args.users
+    draws_per_guild = max(1, -(-args.rows // (rows_per_draw * args.guilds)))
+    interval = max(1, (now - start) // draws_per_guild)
+
+    history = 0
+    async with db.connection() as conn:
+        await conn.execute("BEGIN IMMEDIATE")
+        await conn.executemany(
+                "INSERT INTO guilds(id, channel_id, autodraw_weekday, autodraw_hour) VALUES (?, ?, ?, ?)",
+                [(g, g, rng.randrange(7), rng.randrange(24)) for g in guild_ids])
+        await conn.executemany(
+                "INSERT INTO users(id) VALUES (?)", [(u,) for g in guild_ids for u in users[g]])
+        await conn.executemany(
+                "INSERT INTO enrollments(guild_id, user_id) VALUES (?, ?)",
+                [(g, u) for g in guild_ids for u in users[g]])
+        await conn.executemany(
+                "INSERT INTO entries(name, first, guild_id, user_id) VALUES (?, ?, ?, ?)",
+                [(name, i == 0, g, u) for g in guild_ids for u in users[g]
+                 for i, name in enumerate(rng.sample(names[g], 2))])
+
+        batch = []
+        for draw in range(draws_per_guild):
+            created_at = start + draw * interval
+            for g in guild_ids:
+                if history >= args.rows:
+                    break
+                draw_rows = [[name, 0, g, u, created_at]
+                             for u in users[g] for name in rng.sample(names[g], 2)][:args.rows - history]
+                for row in rng.sample(draw_rows, min(WINNERS_PER_DRAW, len(draw_rows))):
+                    row[1] = 1
+                batch += draw_rows
+                history += len(draw_rows)
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    await conn.executemany(
+                            "INSERT INTO entry_hist(name, won, guild_id, user_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                            batch)
+                    batch = []
+        if batch:
+            await conn.executemany(
+                    "INSERT INTO entry_hist(name, won, guild_id, user_id, created_at) VALUES (?, ?, ?, ?, ?)", batch)
+        await conn.commit()
+    await statsdb.rebuild_stats()
+    return {"guilds": args.guilds, "users": args.guilds * args.users,
+            "entries": args.guilds * args.users * 2, "entry_hist": history}
+
+"""
+Benchmarks
+"""
+
+class FakeGuild:
+    """Just enough of a guild to resolve its members from the member cache"""
+
+    def __init__(self, id: int, user_ids):
+        self.id = id
+        self._members = {user_id: SimpleNamespace(id=user_id, name="user{}".format(user_id),
+                                                  mention="<@{}>".format(user_id)) for user_id in user_ids}
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+    async def query_members(self, user_ids: list[int], limit: int, cache: bool):
+        return [self._members[user_id] for user_id in user_ids if user_id in self._members]
+
+async def make_benchmarks(args, rng: random.Random) -> dict:
+    """Build the benchmarks as name -> zero argument coroutine function"""
+    guild_id = 1
+    entries = await entriesdb.read_all_entries_for_guild(guild_id)
+    guild = FakeGuild(guild_id, {e.user_id for e in entries})
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=365)
+    await guildsdb.load_guild_cache()
+    # Imported here as the checks need the bot's config.json
+    from helpers import checks
+    in_channel = checks.in_channel().predicate
+    ctx = SimpleNamespace(guild=SimpleNamespace(id=guild_id), channel=SimpleNamespace(id=guild_id))
+
+    async def draw():
+        output = MessageBuffer()
+        await compose_draw(output, guild, entries, DRAW_ROUNDS, rng)
+        output.messages()
+
+    async def draw_enter():
+        user_id = guild_id * 1000000 + rng.randrange(args.users)
+        await entriesdb.submit_entries(guild_id, user_id, rng.sample(["a", "b", "c", "d"], 2))
+
+    async def user_stats():
+        await statsdb.read_user_stats_for_guild(guild_id)
+
+    async def user_stats_window():
+        await statsdb.read_user_stats_for_guild(guild_id, since)
+
+    async def entry_stats():
+        await statsdb.read_entry_stats_for_guild(guild_id)
+
+    async def entry_stats_window():
+        await statsdb.read_entry_stats_for_guild(guild_id, since)
+
+    async def history_all():
+        await entryhistdb.read_all_entry_hist_for_guild(guild_id)
+
+    async def history_stream():
+        async for _ in entryhistdb.iter_entry_hist(guild_id):
+            pass
+
+    async def check_in_channel():
+        await in_channel(ctx)
+
+    return {
+        "draw": draw,
+        "draw_enter": draw_enter,
+        "user_stats": user_stats,
+        "user_stats_window": user_stats_window,
+        "entry_stats": entry_stats,
+        "entry_stats_window": entry_stats_window,
+        "history_all": history_all,
+        "history_stream": history_stream,
+        "in_channel": check_in_channel,
+    }
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def measure(func, iterations: int) -> dict:
+    """Time a benchmark, then run it once more under tracemalloc"""
+    await func()
+    times = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        await func()
+        times.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    times.sort()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await func()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {
+        "iterations": iterations,
+        "mean_ms": 1000 * statistics.fmean(times),
+        "p50_ms": 1000 * percentile(times, 50),
+        "p90_ms": 1000 * percentile(times, 90),
+        "p99_ms": 1000 * percentile(times, 99),
+        "max_ms": 1000 * times[-1],
+        "ops_per_sec": iterations / total if total else 0.0,
+        "peak_memory_bytes": peak,
+        "retained_blocks": blocks,
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="aboulomania-bench-"), "bench.db")
+    if os.path.exists(path):
+        print("'{}' already exists, benchmarks need a new db".format(path), file=sys.stderr)
+        return {}
+    await db.init_db(path, pool_size=2)
+    try:
+        start = time.monotonic()
+        counts = await generate(args)
+        print("Generated {} in {:.1f}s".format(counts, time.monotonic() - start), file=sys.stderr)
+
+        rng = random.Random(args.seed)
+        benchmarks = await make_benchmarks(args, rng)
+        results = {}
+        for name, func in benchmarks.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = await measure(func, args.iterations)
+            print("{:<20} p50 {:>9.3f} ms  p99 {:>9.3f} ms  {:>10.1f} ops/s".format(
+                name, results[name]["p50_ms"], results[name]["p99_ms"], results[name]["ops_per_sec"]), file=sys.stderr)
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("db", "output")},
+                "rows": counts,
+            },
+            "benchmarks": results,
+        }
+    finally:
+        await db.close_db()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the draw engine, controllers and stats.")
+    parser.add_argument("--rows", type=int, default=100000, help="entry_hist rows to generate")
+    parser.add_argument("--guilds", type=int, default=10, help="guilds to generate")
+    parser.add_argument("--users", type=int, default=50, help="users (and live entries x2) per guild")
+    parser.add_argument("--years", type=float, default=3, help="years of weekly draw history")
+    parser.add_argument("--iterations", type=int, default=100, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the data and draws")
+    parser.add_argument("--only", action="append", help="only run this benchmark (repeatable)")
+    parser.add_argument("--db", help="new database file to generate (default a temporary file)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    if args.rows < 0 or args.guilds < 1 or args.users < 2 or args.iterations < 1:
+        parser.error("--rows must be >= 0, --guilds >= 1, --users >= 2 and --iterations >= 1")
+
+    report = asyncio.run(run(args))
+    if not report:
+        return 1
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Offline export/import of guild data (no discord connection needed)
+
+Usage:
+    python -m tools.transfer export <file.ndjson.gz> [--guild <guild_id> ...] [--db <path>]
+    python -m tools.transfer import <file.ndjson.gz> [--db <path>]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import database.controllers.transfer as transferdb
+from helpers import db
+
+async def run(args) -> int:
+    await db.init_db(args.db, pool_size=2)
+    try:
+        start = time.monotonic()
+        if args.command == "export":
+            result = await transferdb.export_guilds(args.file, args.guild or None)
+        else:
+            result = await transferdb.import_guilds(args.file)
+        if result is None:
+            print("{} failed, see the logs".format(args.command), file=sys.stderr)
+            return 1
+        print("{}ed {} guilds ({} rows) in {:.2f}s".format(
+            args.command, len(result.guild_ids), result.rows, time.monotonic() - start))
+        return 0
+    finally:
+        await db.close_db()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export or import guild data.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help="gzipped NDJSON export file")
+    parser.add_argument("--guild", type=int, action="append", help="guild id to export (default all)")
+    parser.add_argument("--db", default=db.DATABASE_PATH, help="database file")
+    return asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    sys.exit(main())